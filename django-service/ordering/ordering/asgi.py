@@ -2,6 +2,8 @@
 ASGI config for ordering project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
+Serve through it to use the kitchen board stream (/api/kitchen/stream/), which
+holds one long-lived connection per screen on the event loop.
 
 For more information on this file, see
 https://docs.djangoproject.com/en/4.2/howto/deployment/asgi/
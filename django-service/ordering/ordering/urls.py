@@ -15,8 +15,9 @@ Including another URLconf
     2. Add a URL to urlpatterns:  path('blog/', include('blog.urls'))
 """
 from django.contrib import admin
-from django.urls import path, include
+from django.urls import path, re_path, include
 from django.http import JsonResponse
+from orders.views import liveness, readiness
 
 def health_check(request):
     return JsonResponse({"status": "healthy", "service": "order-service"})
@@ -25,5 +26,8 @@ urlpatterns = [
     path('admin/', admin.site.urls),
     path('api/', include('orders.urls')),  # ← App routes under /api/
     path('health/', health_check, name='health-check'),  # ← Project-level health route
+    # Orchestrator probes; matched with or without the trailing slash so probes never get a redirect
+    re_path(r'^health/live/?$', liveness, name='health-live'),
+    re_path(r'^health/ready/?$', readiness, name='health-ready'),
 
 ]
@@ -2,8 +2,6 @@ from django.apps import AppConfig
 from django.db.models.signals import post_save, post_delete
 from django.conf import settings
 import logging
-import requests
-from requests.exceptions import RequestException
 import sys
 
 logger = logging.getLogger(__name__)
@@ -18,6 +16,14 @@ class OrdersConfig(AppConfig):
         This is where we set up signal handlers, check service dependencies,
         and initialize any required components.
         """
+        # Invalidate cached catalog responses whenever products or categories change
+        from .cache import invalidate_catalog
+        from .models import Category, Product
+
+        for model in (Product, Category):
+            post_save.connect(invalidate_catalog, sender=model, dispatch_uid=f'invalidate_catalog_{model.__name__}_save')
+            post_delete.connect(invalidate_catalog, sender=model, dispatch_uid=f'invalidate_catalog_{model.__name__}_delete')
+
         # Avoid running this in migrations or test environments
         if 'makemigrations' in sys.argv or 'migrate' in sys.argv or 'test' in sys.argv:
             return
@@ -31,34 +37,20 @@ class OrdersConfig(AppConfig):
         post_delete.connect(order_post_delete, sender=Order)
         post_save.connect(order_item_post_save, sender=OrderItem)
 
-        # Perform health checks if not in debug mode
+        # Check dependencies in the background instead of blocking startup on them
         if not getattr(settings, 'DEBUG', True):
-            self._check_service_dependencies()
+            self._start_dependency_prober()
 
         logger.info("Order service initialized successfully")
 
-    def _check_service_dependencies(self):
+    def _start_dependency_prober(self):
         """
-        Check if required services are available.
-        This is a lightweight check to ensure the service can start properly.
+        Start the background prober that checks the database and product service.
+        Its results feed /health/ready; availability changes are logged as they happen.
         """
-        product_service_url = getattr(settings, "PRODUCT_SERVICE_URL", None)
+        from .health import dependency_prober
 
-        if not product_service_url:
+        if not getattr(settings, "PRODUCT_SERVICE_URL", None):
             logger.warning("PRODUCT_SERVICE_URL is not set in settings.")
-            return
 
-        try:
-            response = requests.get(f"{product_service_url}/health/", timeout=2)
-            if response.status_code == 200:
-                logger.info(f"Product service is available at {product_service_url}")
-            else:
-                logger.warning(
-                    f"Product service returned status {response.status_code}. "
-                    f"Order service will operate in degraded mode."
-                )
-        except RequestException as e:
-            logger.warning(
-                f"Could not connect to product service: {str(e)}. "
-                f"Order service will operate in degraded mode."
-            )
+        dependency_prober.start()
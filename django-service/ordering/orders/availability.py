@@ -0,0 +1,90 @@
+# orders/availability.py
+
+import logging
+import threading
+import time
+
+from django.conf import settings
+from django.db import connections
+
+from .cache import get_catalog_version
+from .models import Product
+
+logger = logging.getLogger(__name__)
+
+
+class ProductAvailabilityIndex:
+    """
+    In-memory map of product id -> is_available, built from the synced Product rows.
+
+    The index is rebuilt in one query as soon as the catalog version changes.
+    Without a known change it is refreshed after its TTL: up to the stale limit
+    the old index keeps being served while a background thread rebuilds it
+    (stale-while-revalidate), past it the rebuild happens inline.
+    """
+
+    def __init__(self, ttl=None, stale_ttl=None):
+        self.ttl = ttl if ttl is not None else getattr(settings, 'PRODUCT_AVAILABILITY_TTL', 30)
+        self.stale_ttl = stale_ttl if stale_ttl is not None else getattr(settings, 'PRODUCT_AVAILABILITY_STALE_TTL', 300)
+        self._index = None
+        self._version = None
+        self._built_at = 0
+        self._lock = threading.Lock()
+        self._refreshing = False
+
+    def lookup(self, product_ids):
+        """Return ({product_id: is_available} for known ids, set of unknown ids), ids as strings."""
+        index = self._get_index()
+        known = {}
+        missing = set()
+        for product_id in map(str, product_ids):
+            if product_id in index:
+                known[product_id] = index[product_id]
+            else:
+                missing.add(product_id)
+        return known, missing
+
+    def invalidate(self):
+        """Force a rebuild on the next lookup."""
+        self._index = None
+
+    def _get_index(self):
+        age = time.monotonic() - self._built_at
+        version = get_catalog_version()
+
+        if self._index is None or version != self._version or age > self.stale_ttl:
+            return self._rebuild()
+        if age > self.ttl:
+            self._refresh_in_background()
+        return self._index
+
+    def _rebuild(self):
+        version = get_catalog_version()
+        # The primary, so a lagging replica can't be cached in the index under the new version
+        index = {
+            str(pk): available
+            for pk, available in Product.objects.using('default').values_list('id', 'is_available')
+        }
+        with self._lock:
+            self._index, self._version, self._built_at = index, version, time.monotonic()
+        return index
+
+    def _refresh_in_background(self):
+        with self._lock:
+            if self._refreshing:
+                return
+            self._refreshing = True
+
+        def refresh():
+            try:
+                self._rebuild()
+            except Exception as e:
+                logger.warning(f"Product availability refresh failed: {str(e)}")
+            finally:
+                self._refreshing = False
+                connections.close_all()
+
+        threading.Thread(target=refresh, name='product-availability-refresh', daemon=True).start()
+
+
+availability_index = ProductAvailabilityIndex()
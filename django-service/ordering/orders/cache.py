@@ -0,0 +1,120 @@
+# orders/cache.py
+
+import hashlib
+import json
+import logging
+import time
+import uuid
+from contextlib import contextmanager
+from urllib.parse import urlencode
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import transaction
+from django.utils.http import parse_etags
+
+from .routing import primary_reads
+
+logger = logging.getLogger(__name__)
+
+CATALOG_VERSION_KEY = 'orders:catalog-version'
+
+
+@contextmanager
+def cache_lock(key, timeout):
+    """
+    Hold a cache-based lock for the duration of the block.
+    Yields False when another process (or replica, with a shared cache) holds it.
+    """
+    token = uuid.uuid4().hex
+    acquired = cache.add(key, token, timeout)
+    try:
+        yield acquired
+    finally:
+        if acquired and cache.get(key) == token:
+            cache.delete(key)
+
+
+def get_catalog_version():
+    """
+    Return the current catalog version.
+    The counter is seeded from the clock, so if the cache ever evicts it the
+    new value can never collide with a version that is still cached.
+    """
+    version = cache.get(CATALOG_VERSION_KEY)
+    if version is None:
+        cache.add(CATALOG_VERSION_KEY, int(time.time() * 1000), None)
+        version = cache.get(CATALOG_VERSION_KEY)
+    return version
+
+
+def bump_catalog_version():
+    """Invalidate every cached catalog response by moving to a new version."""
+    try:
+        version = cache.incr(CATALOG_VERSION_KEY)
+    except ValueError:
+        version = get_catalog_version()
+    logger.debug(f"Catalog version bumped to {version}")
+    return version
+
+
+def invalidate_catalog(sender, **kwargs):
+    """Signal receiver: bump the catalog version once the change is committed."""
+    transaction.on_commit(bump_catalog_version)
+
+
+def catalog_cache_key(prefix, request, params):
+    """
+    Build a normalized cache key for a catalog response.
+    Only the given query parameters are used, sorted and stripped, so the same
+    query always maps to the same key regardless of parameter order.
+    """
+    query = []
+    for name in sorted(params):
+        values = sorted(v.strip() for v in request.query_params.getlist(name) if v.strip())
+        if name == 'category':
+            values = [v.lower() for v in values]  # matched with iexact
+        query.extend((name, value) for value in values)
+
+    return f"orders:{prefix}:v{get_catalog_version()}:{request.get_host()}:{urlencode(query)}"
+
+
+def get_or_set_response_data(key, build):
+    """Return cached response data for key, building and caching it on a miss."""
+    data = cache.get(key)
+    if data is None:
+        # Built from the primary: the key's version may be newer than a replica's data
+        with primary_reads():
+            data = build()
+        cache.set(key, data, getattr(settings, 'CATALOG_CACHE_TIMEOUT', 600))
+    return data
+
+
+def get_catalog_snapshot(name, build):
+    """
+    Return (etag, data) for a precomputed catalog document.
+    The document is built once per catalog version and stored with a strong
+    ETag hashed from its content, so unchanged menus keep the same ETag even
+    across version bumps.
+    """
+    key = f"orders:snapshot:{name}:v{get_catalog_version()}"
+    snapshot = cache.get(key)
+    if snapshot is None:
+        with primary_reads():
+            data = build()
+        body = json.dumps(data, cls=DjangoJSONEncoder, sort_keys=True)
+        etag = f'"{hashlib.sha256(body.encode()).hexdigest()[:32]}"'
+        snapshot = (etag, data)
+        cache.set(key, snapshot, getattr(settings, 'CATALOG_CACHE_TIMEOUT', 600))
+    return snapshot
+
+
+def etag_matches(etag, if_none_match):
+    """
+    Weak comparison of an ETag against an If-None-Match header, as RFC 9110
+    requires for GET: a W/ prefix (added when a response is compressed) is ignored.
+    """
+    if if_none_match.strip() == '*':
+        return True
+    return any(tag.removeprefix('W/') == etag.removeprefix('W/') for tag in parse_etags(if_none_match))
@@ -0,0 +1,231 @@
+# orders/clients.py
+
+import logging
+import threading
+import time
+
+import requests
+from django.conf import settings
+from django.core.cache import cache
+from requests.adapters import HTTPAdapter
+from requests.exceptions import RequestException
+from urllib3.util.retry import Retry
+
+logger = logging.getLogger(__name__)
+
+
+class CircuitOpenError(RequestException):
+    """Raised instead of calling a service whose circuit is open."""
+
+
+class CircuitBreaker:
+    """
+    Circuit breaker whose state lives in the shared cache, so every worker
+    process sees an outage as soon as one of them has detected it.
+
+    CLOSED: calls go through; failures within `window` seconds are counted.
+    OPEN: after `max_failures` failures calls fail fast for `reset_timeout` seconds.
+    HALF-OPEN: then up to `half_open_trials` probe calls are let through; a
+    success closes the circuit, a failure opens it again.
+    """
+
+    CLOSED, OPEN, HALF_OPEN = 'CLOSED', 'OPEN', 'HALF-OPEN'
+
+    def __init__(self, name, max_failures=None, window=None, reset_timeout=None, half_open_trials=None):
+        self.name = name
+        self.max_failures = max_failures or getattr(settings, 'CIRCUIT_BREAKER_FAILURES', 5)
+        self.window = window or getattr(settings, 'CIRCUIT_BREAKER_WINDOW', 30)
+        self.reset_timeout = reset_timeout or getattr(settings, 'CIRCUIT_BREAKER_RESET_TIMEOUT', 15)
+        self.half_open_trials = half_open_trials or getattr(settings, 'CIRCUIT_BREAKER_HALF_OPEN_TRIALS', 1)
+        self.transitions = {}
+        self._lock = threading.Lock()
+
+    def _key(self, part):
+        return f"orders:circuit:{self.name}:{part}"
+
+    @property
+    def state(self):
+        open_until = cache.get(self._key('open_until'))
+        if open_until is None:
+            return self.CLOSED
+        return self.OPEN if time.time() < open_until else self.HALF_OPEN
+
+    def before_call(self):
+        """Raise CircuitOpenError unless a call may be made now."""
+        state = self.state
+        if state == self.OPEN:
+            raise CircuitOpenError(f"Circuit {self.name} is OPEN")
+        if state == self.HALF_OPEN:
+            trials_key = self._key('trials')
+            cache.add(trials_key, 0, self.reset_timeout)
+            trial = self._incr(trials_key)
+            if trial > self.half_open_trials:
+                raise CircuitOpenError(f"Circuit {self.name} is HALF-OPEN and probing")
+            if trial == 1:
+                self._transition(self.OPEN, self.HALF_OPEN)
+
+    def record_success(self):
+        if self.state == self.HALF_OPEN:
+            cache.delete_many([self._key('open_until'), self._key('trials'), self._key('failures')])
+            self._transition(self.HALF_OPEN, self.CLOSED)
+
+    def record_failure(self):
+        state = self.state
+        if state == self.HALF_OPEN:
+            self._open()
+            return
+
+        failures_key = self._key('failures')
+        cache.add(failures_key, 0, self.window)
+        if self._incr(failures_key) >= self.max_failures and state == self.CLOSED:
+            self._open()
+
+    def _open(self):
+        previous = self.state
+        # Kept well past reset_timeout so the HALF-OPEN state stays visible
+        cache.set(self._key('open_until'), time.time() + self.reset_timeout, self.reset_timeout * 10)
+        cache.delete_many([self._key('trials'), self._key('failures')])
+        self._transition(previous, self.OPEN)
+
+    def _incr(self, key):
+        try:
+            return cache.incr(key)
+        except ValueError:
+            # Expired between add() and incr()
+            cache.add(key, 1, self.window)
+            return 1
+
+    def _transition(self, old, new):
+        transition = f"{old}->{new}"
+        with self._lock:
+            self.transitions[transition] = self.transitions.get(transition, 0) + 1
+        logger.warning(f"Circuit {self.name} changed from {old} to {new}")
+
+    def metrics(self):
+        """Current state and the number of state changes seen by this process."""
+        with self._lock:
+            return {'state': self.state, 'transitions': dict(self.transitions)}
+
+
+class ServiceClient:
+    """
+    Pooled, keep-alive HTTP client for one downstream service.
+
+    All calls share one requests.Session, so connections are reused instead of
+    being set up per call. Each named endpoint has its own timeout, idempotent
+    requests get a bounded number of retries on connection errors and
+    502/503/504 (never on read timeouts), and per-endpoint latency is recorded
+    for metrics(), reported by /health/. Every call goes through the service's
+    shared circuit breaker.
+    """
+
+    def __init__(self, name, url_setting, timeouts=None, default_timeout=3):
+        self.name = name
+        self.breaker = CircuitBreaker(name)
+        self.url_setting = url_setting
+        self.timeouts = timeouts or {}
+        self.default_timeout = default_timeout
+        self._session = None
+        self._lock = threading.Lock()
+        self._metrics = {}
+
+    @property
+    def base_url(self):
+        return getattr(settings, self.url_setting, '') or ''
+
+    @property
+    def session(self):
+        if self._session is None:
+            with self._lock:
+                if self._session is None:
+                    self._session = self._build_session()
+        return self._session
+
+    def _build_session(self):
+        retries = getattr(settings, 'SERVICE_HTTP_RETRIES', 2)
+        pool_size = getattr(settings, 'SERVICE_HTTP_POOL_SIZE', 10)
+        retry = Retry(
+            total=retries,
+            # A read timeout means the service is slow, not unreachable: retrying it would
+            # multiply the caller's wait (e.g. validate on order create) before the breaker sees it
+            read=0,
+            backoff_factor=0.1,
+            status_forcelist=(502, 503, 504),
+            allowed_methods=frozenset(['GET', 'HEAD']),
+            raise_on_status=False,
+        )
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=retry)
+
+        session = requests.Session()
+        session.mount('http://', adapter)
+        session.mount('https://', adapter)
+        session.headers.update({'User-Agent': f"{getattr(settings, 'SERVICE_NAME', 'orders')}/{getattr(settings, 'SERVICE_VERSION', '')}"})
+        return session
+
+    def url(self, path):
+        """Absolute URLs (e.g. pagination `next` links) are used as they are."""
+        if path.startswith(('http://', 'https://')):
+            return path
+        return f"{self.base_url}{path}"
+
+    def request(self, method, path, endpoint='default', **kwargs):
+        kwargs.setdefault('timeout', self.timeouts.get(endpoint, self.default_timeout))
+        self.breaker.before_call()
+
+        started = time.perf_counter()
+        try:
+            response = self.session.request(method, self.url(path), **kwargs)
+        except RequestException:
+            self._record(endpoint, time.perf_counter() - started, error=True)
+            self.breaker.record_failure()
+            raise
+
+        failed = response.status_code >= 500
+        self._record(endpoint, time.perf_counter() - started, error=failed)
+        if failed:
+            self.breaker.record_failure()
+        else:
+            self.breaker.record_success()
+        return response
+
+    def get(self, path, endpoint='default', **kwargs):
+        return self.request('GET', path, endpoint=endpoint, **kwargs)
+
+    def post(self, path, endpoint='default', **kwargs):
+        return self.request('POST', path, endpoint=endpoint, **kwargs)
+
+    def _record(self, endpoint, elapsed, error=False):
+        with self._lock:
+            stats = self._metrics.setdefault(endpoint, {'calls': 0, 'errors': 0, 'total_ms': 0.0, 'max_ms': 0.0})
+            elapsed_ms = elapsed * 1000
+            stats['calls'] += 1
+            stats['errors'] += int(error)
+            stats['total_ms'] += elapsed_ms
+            stats['max_ms'] = max(stats['max_ms'], elapsed_ms)
+        logger.debug(f"{self.name} {endpoint}: {elapsed_ms:.1f}ms{' (error)' if error else ''}")
+
+    def metrics(self):
+        """Per-endpoint call count, error count and latency (mean/max, in ms), plus circuit state."""
+        with self._lock:
+            endpoints = {
+                endpoint: {
+                    'calls': stats['calls'],
+                    'errors': stats['errors'],
+                    'mean_ms': round(stats['total_ms'] / stats['calls'], 1) if stats['calls'] else 0,
+                    'max_ms': round(stats['max_ms'], 1),
+                }
+                for endpoint, stats in self._metrics.items()
+            }
+        return {'endpoints': endpoints, 'circuit': self.breaker.metrics()}
+
+
+product_service = ServiceClient(
+    'product-service', 'PRODUCT_SERVICE_URL',
+    timeouts={'health': 1, 'validate': 3, 'catalog': 10},
+)
+
+# EVENT_SERVICE_URL is the full publish endpoint, so calls use an empty path
+event_service = ServiceClient(
+    'event-service', 'EVENT_SERVICE_URL',
+    timeouts={'publish': 2},
+)
@@ -0,0 +1,155 @@
+# orders/health.py
+
+import logging
+import os
+import threading
+import time
+
+from django.conf import settings
+from django.db import connection, connections
+from django.utils import timezone
+
+from .clients import product_service
+
+logger = logging.getLogger(__name__)
+
+
+class DependencyProber:
+    """
+    Check the service's dependencies on a schedule in a background thread.
+
+    Health endpoints read the last results instead of probing on every
+    request, so orchestrator probes from many replicas cost nothing and can't
+    time out on a slow dependency. One prober runs per worker process.
+    """
+
+    def __init__(self, interval=None):
+        self.interval = interval or getattr(settings, 'HEALTH_PROBE_INTERVAL', 10)
+        self._results = None
+        self._checked_at = None
+        self._lock = threading.Lock()
+        self._thread = None
+        self._pid = None
+        self._stop = threading.Event()
+
+    def check_database(self):
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT 1")
+        return True
+
+    def check_product_service(self):
+        if not getattr(settings, 'PRODUCT_SERVICE_URL', ''):
+            return False
+        response = product_service.get("/health/", endpoint="health")
+        return response.status_code == 200
+
+    def probe(self):
+        """Run every check once and store the results."""
+        results = {}
+        for name, check in (('database', self.check_database), ('product_service', self.check_product_service)):
+            started = time.perf_counter()
+            try:
+                up = check()
+            except Exception as e:
+                logger.debug(f"Dependency check {name} failed: {str(e)}")
+                up = False
+            results[name] = {
+                'status': 'up' if up else 'down',
+                'latency_ms': round((time.perf_counter() - started) * 1000, 1),
+            }
+
+        with self._lock:
+            previous = self._results
+            self._results, self._checked_at = results, time.monotonic()
+
+        self._log_changes(previous, results)
+        return results
+
+    def _log_changes(self, previous, results):
+        for name, result in results.items():
+            if previous is not None and previous[name]['status'] == result['status']:
+                continue
+            if result['status'] == 'up':
+                logger.info(f"Dependency {name} is available")
+            else:
+                logger.warning(f"Dependency {name} is unavailable. Order service will operate in degraded mode.")
+
+    def status(self):
+        """Return (results, age in seconds) of the last probe, or (None, None) if none ran yet."""
+        with self._lock:
+            if self._results is None:
+                return None, None
+            return self._results, round(time.monotonic() - self._checked_at, 1)
+
+    def invalidate(self):
+        """Forget the last results."""
+        with self._lock:
+            self._results = self._checked_at = None
+
+    def start(self):
+        """Start probing in the background in this process."""
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive() and self._pid == os.getpid():
+                return
+            self._pid = os.getpid()
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name='dependency-prober', daemon=True)
+            self._thread.start()
+
+    def ensure_started(self):
+        """Restart the probe thread if it was started but isn't running here (e.g. after a fork)."""
+        if self._pid is None:
+            return
+        if self._pid != os.getpid() or not self._thread.is_alive():
+            self.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                self.probe()
+            finally:
+                # Don't keep a database connection open between probes
+                connections.close_all()
+            self._stop.wait(self.interval)
+
+    def current(self):
+        """
+        Readiness report for a health endpoint. Without a background thread
+        (DEBUG, tests) results older than one interval are refreshed inline.
+        """
+        if self._pid is None:
+            results, age = self.status()
+            if results is None or age > self.interval:
+                self.probe()
+        else:
+            self.ensure_started()
+        return self.report()
+
+    def report(self):
+        """Readiness report built from the cached results."""
+        results, age = self.status()
+        if results is None:
+            return {'status': 'starting', 'dependencies': {}, 'age': None}
+
+        max_age = getattr(settings, 'HEALTH_PROBE_MAX_AGE', self.interval * 3)
+        if age > max_age:
+            overall = 'stale'
+        elif results['database']['status'] != 'up':
+            overall = 'unavailable'
+        elif all(result['status'] == 'up' for result in results.values()):
+            overall = 'healthy'
+        else:
+            overall = 'degraded'
+
+        return {
+            'status': overall,
+            'dependencies': {name: result['status'] for name, result in results.items()},
+            'age': age,
+            'checked_at': (timezone.now() - timezone.timedelta(seconds=age)).isoformat(),
+        }
+
+
+dependency_prober = DependencyProber()
@@ -0,0 +1,219 @@
+# orders/kitchen.py
+
+import asyncio
+import json
+import logging
+from datetime import timedelta
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.utils import timezone
+from rest_framework.fields import DateTimeField
+
+from .models import Order
+
+logger = logging.getLogger(__name__)
+
+BOARD_STATUSES = ('CONFIRMED', 'PREPARING')
+
+# Columns of the flat kitchen query (order x items x product x category)
+ORDER_FIELDS = (
+    'id', 'status', 'table_number', 'customer_name', 'special_requests',
+    'is_takeaway', 'created_at', 'confirmed_at',
+)
+ITEM_FIELDS = (
+    'items__id', 'items__product__name', 'items__quantity', 'items__special_instructions',
+    'items__is_prepared', 'items__product__category__name',
+)
+
+
+def kitchen_orders(queryset):
+    """
+    Build kitchen payloads (order fields, simplified items, time_elapsed) for the orders in
+    queryset from one flat joined query over order, items, product and category.
+    Returns {order id: payload} in creation order.
+    """
+    datetime_field = DateTimeField()
+    now = timezone.now()
+    orders = {}
+
+    for row in queryset.values(*ORDER_FIELDS, *ITEM_FIELDS).order_by('created_at', 'items__id'):
+        key = str(row['id'])
+        order = orders.get(key)
+        if order is None:
+            confirmed_at = row['confirmed_at']
+            order = orders[key] = {
+                'id': key,
+                'status': row['status'],
+                'table_number': row['table_number'],
+                'customer_name': row['customer_name'],
+                'items': [],
+                'special_requests': row['special_requests'],
+                'is_takeaway': row['is_takeaway'],
+                'created_at': datetime_field.to_representation(row['created_at']),
+                'confirmed_at': datetime_field.to_representation(confirmed_at) if confirmed_at else None,
+                'time_elapsed': int((now - confirmed_at).total_seconds() // 60) if confirmed_at else 0,
+            }
+
+        if row['items__id'] is not None:
+            order['items'].append({
+                'id': row['items__id'],
+                'name': row['items__product__name'],
+                'quantity': row['items__quantity'],
+                'instructions': row['items__special_instructions'],
+                'is_prepared': row['items__is_prepared'],
+                'category': row['items__product__category__name'] or 'Uncategorized',
+            })
+
+    return orders
+
+
+def sse_message(event, data):
+    """Format one Server-Sent Events message."""
+    return f"event: {event}\ndata: {json.dumps(data, cls=DjangoJSONEncoder)}\n\n"
+
+
+class KitchenFeed:
+    """
+    One change feed per process for every connected kitchen screen.
+
+    The feed keeps the current board (CONFIRMED/PREPARING orders) in memory and
+    polls for orders whose updated_at moved since its cursor, waking early when
+    an order is changed in this process. Changes are fanned out as per-order
+    deltas ('upsert' / 'remove') to one queue per connected stream; a new
+    stream gets the in-memory board as its snapshot. The feed runs on the ASGI
+    event loop while anyone is connected and stops when the last stream closes.
+    """
+
+    def __init__(self, poll_interval=None, overlap=None, queue_size=None):
+        self.poll_interval = poll_interval or getattr(settings, 'KITCHEN_STREAM_POLL_INTERVAL', 2)
+        # Re-read recent changes so rows committed late with an older updated_at aren't missed
+        self.overlap = timedelta(seconds=overlap or getattr(settings, 'KITCHEN_STREAM_OVERLAP', 5))
+        self.queue_size = queue_size or getattr(settings, 'KITCHEN_STREAM_QUEUE_SIZE', 100)
+        self.board = {}
+        self.cursor = None
+        self._subscribers = set()
+        self._task = None
+        self._loop = None
+        self._wake = None
+        self._ready = None
+
+    def subscribe(self):
+        """Register a stream and start the feed if needed. Returns the stream's queue."""
+        loop = asyncio.get_running_loop()
+        if self._task is None or self._loop is not loop:
+            self._loop = loop
+            self._wake = asyncio.Event()
+            self._ready = asyncio.Event()
+            self._task = loop.create_task(self._run())
+
+        queue = asyncio.Queue(maxsize=self.queue_size)
+        self._subscribers.add(queue)
+        return queue
+
+    def unsubscribe(self, queue):
+        self._subscribers.discard(queue)
+        if not self._subscribers and self._wake is not None:
+            self._wake.set()
+
+    async def snapshot(self):
+        """The current board, once the feed has loaded it."""
+        await self._ready.wait()
+        return list(self.board.values())
+
+    def notify(self):
+        """Wake the feed now. Safe to call from any thread, e.g. an on_commit hook."""
+        loop, wake = self._loop, self._wake
+        if loop is not None and wake is not None and not loop.is_closed():
+            loop.call_soon_threadsafe(wake.set)
+
+    async def stop(self):
+        """Stop the feed and forget its board."""
+        task, self._task = self._task, None
+        if task is not None:
+            task.cancel()
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
+        self.board, self.cursor = {}, None
+
+    async def _run(self):
+        try:
+            await sync_to_async(self.load_board)()
+        except Exception as e:
+            logger.error(f"Kitchen feed could not load the board: {str(e)}")
+        self._ready.set()
+
+        while True:
+            try:
+                await asyncio.wait_for(self._wake.wait(), self.poll_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wake.clear()
+
+            if not self._subscribers:
+                # Nobody is watching; the next stream starts a fresh feed
+                self._task = None
+                self.board, self.cursor = {}, None
+                return
+
+            try:
+                events = await sync_to_async(self.poll)()
+            except Exception as e:
+                logger.warning(f"Kitchen feed poll failed: {str(e)}")
+                continue
+            for event in events:
+                self._broadcast(event)
+
+    def _broadcast(self, event):
+        for queue in list(self._subscribers):
+            try:
+                queue.put_nowait(event)
+            except asyncio.QueueFull:
+                # Too far behind for deltas: drop them and resend the whole board
+                while not queue.empty():
+                    queue.get_nowait()
+                queue.put_nowait(('snapshot', None))
+
+    @staticmethod
+    def _same(old, new):
+        """Compare payloads ignoring time_elapsed, which screens can tick locally."""
+        if old is None:
+            return False
+        return {k: v for k, v in old.items() if k != 'time_elapsed'} == {k: v for k, v in new.items() if k != 'time_elapsed'}
+
+    def load_board(self):
+        """Load the full board and start the cursor."""
+        cursor = timezone.now()
+        self.board = kitchen_orders(Order.objects.filter(status__in=BOARD_STATUSES))
+        self.cursor = cursor
+
+    def poll(self):
+        """Apply the orders changed since the cursor to the board and return the deltas."""
+        now = timezone.now()
+        events = []
+
+        changed = kitchen_orders(Order.objects.filter(updated_at__gte=self.cursor - self.overlap))
+        for key, payload in changed.items():
+            if payload['status'] in BOARD_STATUSES:
+                if not self._same(self.board.get(key), payload):
+                    self.board[key] = payload
+                    events.append(('upsert', payload))
+            elif key in self.board:
+                del self.board[key]
+                events.append(('remove', {'id': key}))
+
+        # Deleted orders leave no updated_at behind
+        if self.board:
+            existing = {str(pk) for pk in Order.objects.filter(id__in=list(self.board)).values_list('id', flat=True)}
+            for key in set(self.board) - existing:
+                del self.board[key]
+                events.append(('remove', {'id': key}))
+
+        self.cursor = now
+        return events
+
+
+kitchen_feed = KitchenFeed()
@@ -0,0 +1,165 @@
+import random
+import statistics
+import time
+from contextlib import contextmanager
+from datetime import timedelta
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.db.models import Avg, Count, DurationField, ExpressionWrapper, F
+from django.utils import timezone
+
+from orders.models import Order
+
+User = get_user_model()
+
+# Status mix of a mature table: almost everything has finished
+STATUS_WEIGHTS = {
+    'DELIVERED': 90, 'CANCELLED': 6, 'PENDING': 1, 'CONFIRMED': 1, 'PREPARING': 1, 'READY': 1,
+}
+
+
+class Rollback(Exception):
+    """Raised to discard the seeded rows at the end of the benchmark."""
+
+
+class Command(BaseCommand):
+    help = (
+        "Seed a large number of orders and compare the plans and latencies of the "
+        "main order queries without and with the Order indexes. Everything runs in "
+        "one transaction that is rolled back unless --keep is given."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--orders', type=int, default=2_000_000, help='Orders to seed.')
+        parser.add_argument('--users', type=int, default=5_000, help='Customers the orders belong to.')
+        parser.add_argument('--days', type=int, default=365, help='Days of history to spread orders over.')
+        parser.add_argument('--batch-size', type=int, default=10_000, help='Rows per insert.')
+        parser.add_argument('--repeat', type=int, default=20, help='Timed runs per query.')
+        parser.add_argument('--keep', action='store_true', help='Commit the seeded orders instead of rolling back.')
+
+    def handle(self, *args, **options):
+        try:
+            with transaction.atomic():
+                users = self.seed(options)
+                queries = self.queries(random.choice(users))
+
+                with self.without_indexes():
+                    self.analyze()
+                    before = self.measure(queries, options['repeat'], 'without indexes')
+                self.analyze()
+                after = self.measure(queries, options['repeat'], 'with indexes')
+
+                self.report(before, after)
+                if not options['keep']:
+                    raise Rollback()
+        except Rollback:
+            self.stdout.write("Seeded rows rolled back.")
+
+    def seed(self, options):
+        """Insert users and orders in batches; returns the user ids."""
+        started = time.perf_counter()
+        prefix = f"bench-{int(time.time())}"
+        User.objects.bulk_create(
+            [User(username=f"{prefix}-{i}") for i in range(options['users'])],
+            batch_size=options['batch_size'],
+        )
+        users = list(User.objects.filter(username__startswith=prefix).values_list('id', flat=True))
+
+        statuses = list(STATUS_WEIGHTS)
+        weights = list(STATUS_WEIGHTS.values())
+        now = timezone.now()
+        span = options['days'] * 86400
+
+        with self.manual_timestamps():
+            remaining = options['orders']
+            while remaining > 0:
+                batch = []
+                for status in random.choices(statuses, weights, k=min(remaining, options['batch_size'])):
+                    created_at = now - timedelta(seconds=random.randint(0, span))
+                    order = Order(user_id=random.choice(users), status=status, total_price=random.randint(5, 80),
+                                  created_at=created_at, updated_at=created_at)
+                    if status not in ('PENDING', 'CANCELLED'):
+                        order.confirmed_at = created_at + timedelta(minutes=1)
+                    if status in ('READY', 'DELIVERED'):
+                        order.ready_at = order.confirmed_at + timedelta(minutes=random.randint(5, 40))
+                    batch.append(order)
+                Order.objects.bulk_create(batch)
+                remaining -= len(batch)
+
+        self.stdout.write(f"Seeded {options['orders']} orders in {time.perf_counter() - started:.1f}s")
+        return users
+
+    @contextmanager
+    def manual_timestamps(self):
+        """Let bulk_create keep the generated created_at/updated_at values."""
+        fields = [Order._meta.get_field('created_at'), Order._meta.get_field('updated_at')]
+        saved = [(field.auto_now, field.auto_now_add) for field in fields]
+        for field in fields:
+            field.auto_now = field.auto_now_add = False
+        try:
+            yield
+        finally:
+            for field, (auto_now, auto_now_add) in zip(fields, saved):
+                field.auto_now, field.auto_now_add = auto_now, auto_now_add
+
+    @contextmanager
+    def without_indexes(self):
+        """Drop the Order indexes for the block, then create them again."""
+        # CREATE statements are built without entering the editor, which SQLite refuses inside a transaction
+        editor = connection.schema_editor(collect_sql=True)
+        indexes = Order._meta.indexes
+        with connection.cursor() as cursor:
+            for index in indexes:
+                cursor.execute(f"DROP INDEX {connection.ops.quote_name(index.name)}")
+            try:
+                yield
+            finally:
+                started = time.perf_counter()
+                for index in indexes:
+                    cursor.execute(str(index.create_sql(Order, editor)))
+                self.stdout.write(f"Built {len(indexes)} indexes in {time.perf_counter() - started:.1f}s")
+
+    def analyze(self):
+        """Refresh planner statistics so plans reflect the seeded data."""
+        with connection.cursor() as cursor:
+            cursor.execute("ANALYZE")
+
+    def queries(self, user_id):
+        """The order access patterns of the API, as (name, queryset, run) tuples."""
+        since = timezone.now() - timedelta(days=1)
+        prep_time = ExpressionWrapper(F('ready_at') - F('confirmed_at'), output_field=DurationField())
+        # order_by() drops Meta.ordering, which the aggregates don't use
+        day = Order.objects.filter(created_at__gte=since).order_by()
+        prepared = day.filter(confirmed_at__isnull=False, ready_at__isnull=False)
+        return [
+            ('kitchen board', Order.objects.filter(status__in=['CONFIRMED', 'PREPARING']).order_by('created_at')[:50], list),
+            ('active orders', Order.objects.exclude(status__in=['DELIVERED', 'CANCELLED']).order_by('-created_at')[:50], list),
+            ('customer history', Order.objects.filter(
+                user_id=user_id, status__in=['DELIVERED', 'CANCELLED']).order_by('-created_at')[:20], list),
+            ('pending count', Order.objects.filter(status='PENDING').order_by().values('id'), lambda qs: qs.count()),
+            ('orders last 24h', day.values('id'), lambda qs: qs.aggregate(n=Count('id'))),
+            ('prep time 24h', prepared.values('id'), lambda qs: qs.aggregate(avg=Avg(prep_time))),
+        ]
+
+    def measure(self, queries, repeat, label):
+        self.stdout.write(self.style.MIGRATE_HEADING(f"\n== {label} =="))
+        results = {}
+        for name, queryset, run in queries:
+            timings = []
+            for _ in range(repeat):
+                started = time.perf_counter()
+                run(queryset.all())
+                timings.append((time.perf_counter() - started) * 1000)
+            results[name] = statistics.median(timings)
+            self.stdout.write(f"\n{name}: median {results[name]:.2f}ms over {repeat} runs")
+            self.stdout.write(queryset.explain())
+        return results
+
+    def report(self, before, after):
+        self.stdout.write(self.style.MIGRATE_HEADING("\n== summary (median ms) =="))
+        self.stdout.write(f"{'query':<20}{'without':>12}{'with':>12}{'speedup':>10}")
+        for name in before:
+            speedup = before[name] / after[name] if after[name] else float('inf')
+            self.stdout.write(f"{name:<20}{before[name]:>12.2f}{after[name]:>12.2f}{speedup:>9.1f}x")
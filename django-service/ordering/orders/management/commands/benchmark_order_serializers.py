@@ -0,0 +1,104 @@
+import random
+import statistics
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from rest_framework.renderers import JSONRenderer
+
+from orders.models import Category, Order, OrderItem, Product
+from orders.projections import OrderProjection, order_rows
+from orders.renderers import OrJSONRenderer
+from orders.serializers import OrderSerializer
+
+User = get_user_model()
+
+
+class Rollback(Exception):
+    """Raised to discard the seeded rows at the end of the benchmark."""
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare rendering a page of orders with OrderSerializer and with the "
+        "values() OrderProjection used by the list, active and history views, "
+        "and JSON encoding with DRF's JSONRenderer and OrJSONRenderer. "
+        "Seeded rows are rolled back."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--orders', type=int, default=100, help='Orders in the page.')
+        parser.add_argument('--items', type=int, default=4, help='Items per order.')
+        parser.add_argument('--repeat', type=int, default=20, help='Timed runs per representation.')
+
+    def handle(self, *args, **options):
+        try:
+            with transaction.atomic():
+                orders = self.seed(options['orders'], options['items'])
+                self.compare(orders, options['repeat'])
+                raise Rollback()
+        except Rollback:
+            self.stdout.write("Seeded rows rolled back.")
+
+    def seed(self, count, items_per_order):
+        """Insert a page worth of orders with items; returns their queryset."""
+        prefix = f"bench-{int(time.time())}"
+        user = User.objects.create(username=prefix)
+        category = Category.objects.create(name=prefix)
+        products = Product.objects.bulk_create([
+            Product(external_id=f"{prefix}-{i}", name=f"Dish {i}", price=random.randint(300, 2500) / 100,
+                    description="A dish with a description of realistic length for a menu.",
+                    category=category, image_url=f"https://example.com/{i}.jpg")
+            for i in range(max(items_per_order, 20))
+        ])
+
+        orders = Order.objects.bulk_create([
+            Order(user=user, customer_name=f"Customer {i}", status='DELIVERED', table_number=i % 30)
+            for i in range(count)
+        ])
+        OrderItem.objects.bulk_create([
+            OrderItem(order=order, product=product, quantity=random.randint(1, 3), unit_price=product.price)
+            for order in orders
+            for product in random.sample(products, items_per_order)
+        ])
+        return Order.objects.filter(user=user).order_by('-created_at', '-id')
+
+    def compare(self, orders, repeat):
+        """Time serialization alone (rows already loaded), then queries plus serialization."""
+        projection = OrderProjection()
+        instances = list(orders.prefetch_related('items__product__category'))
+        rows = list(order_rows(orders))
+        item_rows = projection.fetch_items(rows)
+
+        self.stdout.write(self.style.MIGRATE_HEADING(f"\n== {len(rows)} orders, {len(item_rows)} items =="))
+        self.report('serialization only', repeat, {
+            'OrderSerializer': lambda: OrderSerializer(instances, many=True).data,
+            'OrderProjection': lambda: projection.render(rows, item_rows),
+        })
+        self.report('queries + serialization', repeat, {
+            'OrderSerializer': lambda: OrderSerializer(orders.prefetch_related('items__product__category'), many=True).data,
+            'OrderProjection': lambda: projection.represent(order_rows(orders)),
+        })
+        payload = projection.render(rows, item_rows)
+        self.report('JSON rendering', repeat, {
+            'JSONRenderer': lambda: JSONRenderer().render(payload),
+            'OrJSONRenderer': lambda: OrJSONRenderer().render(payload),
+        })
+
+    def report(self, label, repeat, renderers):
+        results = {}
+        self.stdout.write(f"\n{label}:")
+        for name, render in renderers.items():
+            render()  # warm up
+            timings = []
+            for _ in range(repeat):
+                started = time.perf_counter()
+                render()
+                timings.append((time.perf_counter() - started) * 1000)
+            results[name] = statistics.median(timings)
+            self.stdout.write(f"  {name:<16} median {results[name]:8.2f}ms over {repeat} runs")
+
+        baseline, candidate = results
+        speedup = results[baseline] / results[candidate]
+        self.stdout.write(self.style.SUCCESS(f"  {candidate} is {speedup:.1f}x faster"))
@@ -0,0 +1,43 @@
+import logging
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils.dateparse import parse_date
+
+from orders.rollups import day_start, rebuild
+
+logger = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    help = (
+        "Backfill or rebuild the hourly/daily sales rollups from the order tables. "
+        "Without dates every rollup is rebuilt; with dates only the covered days are."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--since', help='First day to rebuild (YYYY-MM-DD).')
+        parser.add_argument('--until', help='Last day to rebuild, inclusive (YYYY-MM-DD).')
+
+    def handle(self, *args, **options):
+        start = self.parse_day(options['since'], '--since')
+        end = self.parse_day(options['until'], '--until')
+        if start and end and start > end:
+            raise CommandError("--since must not be after --until")
+
+        count = rebuild(
+            start=day_start(start) if start else None,
+            end=day_start(end + timedelta(days=1)) if end else None,
+        )
+        self.stdout.write(self.style.SUCCESS(f"Rolled up {count} delivered/cancelled orders"))
+
+    def parse_day(self, value, option):
+        if not value:
+            return None
+        try:
+            day = parse_date(value)
+        except ValueError:
+            day = None
+        if day is None:
+            raise CommandError(f"{option} must be a date (YYYY-MM-DD)")
+        return day
@@ -0,0 +1,54 @@
+import logging
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import DecimalField, F, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce, Round
+
+from orders.models import Order, OrderItem
+
+logger = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    help = (
+        "Find orders whose total_price differs from the sum of their items' "
+        "unit_price x quantity, and with --fix recompute them. Order totals are "
+        "kept up to date incrementally, so any drift points at a write that "
+        "bypassed the models (raw SQL, queryset.update on items)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--fix', action='store_true', help='Recompute the drifted totals.')
+        parser.add_argument('--limit', type=int, default=100, help='Drifted orders to list.')
+
+    def handle(self, *args, **options):
+        items_total = OrderItem.objects.filter(order=OuterRef('pk')).order_by().values('order').annotate(
+            total=Sum(F('unit_price') * F('quantity'))
+        ).values('total')
+        drifted = Order.objects.annotate(
+            items_total=Round(Coalesce(
+                Subquery(items_total), Value(Decimal('0')), output_field=DecimalField(max_digits=12, decimal_places=2)
+            ), 2)
+        ).exclude(total_price=F('items_total')).order_by()
+
+        rows = list(drifted.values_list('id', 'total_price', 'items_total'))
+        for order_id, total_price, items_total in rows[:options['limit']]:
+            self.stdout.write(f"Order {order_id}: total_price {total_price}, items {items_total}")
+
+        if not rows:
+            self.stdout.write(self.style.SUCCESS("All order totals match their items"))
+            return
+        if not options['fix']:
+            self.stdout.write(self.style.WARNING(f"{len(rows)} orders drifted; run with --fix to recompute them"))
+            return
+
+        for order_id, _, _ in rows:
+            with transaction.atomic():
+                # Item changes queue behind the lock, then add their deltas to the new total
+                order = Order.objects.select_for_update().filter(pk=order_id).first()
+                if order is not None:
+                    order.recalculate_total()
+        logger.info(f"Recomputed {len(rows)} drifted order totals")
+        self.stdout.write(self.style.SUCCESS(f"Recomputed {len(rows)} order totals"))
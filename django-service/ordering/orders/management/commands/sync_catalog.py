@@ -0,0 +1,74 @@
+import logging
+import random
+import signal
+import threading
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from requests.exceptions import RequestException
+
+from orders.sync import CatalogSyncEngine, ProductServiceError, SyncDeadlineExceeded, sync_lock
+
+logger = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    help = (
+        "Keep the local catalog in sync with the product service. "
+        "Runs delta syncs on a jittered interval; only one replica syncs at a time."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true', help='Run a single sync and exit.')
+        parser.add_argument('--full', action='store_true', help='Re-read the whole catalog instead of a delta.')
+        parser.add_argument(
+            '--interval', type=int, default=settings.CATALOG_SYNC_INTERVAL,
+            help='Seconds between syncs.'
+        )
+        parser.add_argument(
+            '--jitter', type=float, default=settings.CATALOG_SYNC_JITTER,
+            help='Random +/- fraction of the interval, so replicas do not wake together.'
+        )
+
+    def handle(self, *args, **options):
+        stop = threading.Event()
+        signal.signal(signal.SIGTERM, lambda signum, frame: stop.set())
+        signal.signal(signal.SIGINT, lambda signum, frame: stop.set())
+
+        engine = CatalogSyncEngine()
+
+        while not stop.is_set():
+            self.sync_once(engine, full=options['full'])
+            if options['once']:
+                break
+
+            delay = options['interval'] * (1 + random.uniform(-options['jitter'], options['jitter']))
+            stop.wait(max(delay, 1))
+
+    def sync_once(self, engine, full=False):
+        """Run one sync under the shared lock. Returns the report, or None if skipped/failed."""
+        lock_timeout = settings.CATALOG_SYNC_LOCK_TIMEOUT
+        with sync_lock(lock_timeout) as acquired:
+            if not acquired:
+                logger.info("Catalog sync skipped: another worker holds the lock")
+                return None
+
+            # Give up well before the lock can expire and another worker start syncing
+            # alongside; the next run starts again from the same sync point
+            deadline = time.monotonic() + lock_timeout / 2
+            try:
+                report = engine.run(deadline=deadline) if full else engine.run_delta(deadline=deadline)
+            except (ProductServiceError, RequestException, SyncDeadlineExceeded) as e:
+                logger.warning(f"Catalog sync failed: {str(e)}")
+                return None
+            except Exception:
+                # Database errors or a malformed payload must not end the worker loop
+                logger.exception("Catalog sync failed unexpectedly")
+                return None
+
+        self.stdout.write(
+            f"{report['mode']} sync: {report['created']} created, {report['updated']} updated, "
+            f"{report['unchanged']} unchanged, {report['removed']} removed"
+        )
+        return report
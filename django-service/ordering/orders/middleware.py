@@ -0,0 +1,149 @@
+# orders/middleware.py
+
+import hashlib
+import logging
+import re
+from urllib.parse import urlencode
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.http import HttpResponseNotModified
+from django.utils.cache import patch_cache_control, patch_vary_headers
+from django.utils.text import compress_string
+
+from .cache import etag_matches, get_catalog_version
+from .routing import read_from_replica
+
+try:
+    import brotli
+except ImportError:  # optional: gzip is used when brotli isn't installed
+    brotli = None
+
+logger = logging.getLogger(__name__)
+
+# API payloads only: HTML pages carry the CSRF token, and compressing them
+# without padding would reopen BREACH
+COMPRESSIBLE_TYPES = ('application/json', 'application/msgpack')
+BROTLI_QUALITY = 5  # close to gzip's speed at a noticeably better ratio for JSON
+_ENCODING_RE = re.compile(r'\s*([^\s;,]+)\s*(?:;\s*q\s*=\s*([0-9.]+))?')
+
+
+class CatalogETagMiddleware:
+    """
+    Conditional GET for the public catalog endpoints (CATALOG_ETAG_PATHS).
+    The ETag is derived from the catalog version and the request, so it is
+    known before the view runs: a matching If-None-Match gets a 304 for one
+    cache read, without rendering or hashing the body. Responses that set
+    their own ETag (the by_category snapshot) keep it, and responses read from
+    a replica get none, as the replica may still be behind that version.
+
+    Off unless CATALOG_ETAGS is set, which it is by default only with a
+    shared cache: with a per-process cache, workers never see the version
+    bumps made by sync_catalog or other workers and would keep answering 304.
+    """
+
+    def __init__(self, get_response):
+        if not getattr(settings, 'CATALOG_ETAGS', False):
+            logger.warning("Catalog ETags are off: set CACHE_URL to a shared cache (and CATALOG_ETAGS) to enable them")
+            raise MiddlewareNotUsed()
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if not self.applies_to(request):
+            return self.get_response(request)
+
+        etag = self.catalog_etag(request)
+        if etag_matches(etag, request.headers.get('If-None-Match', '')):
+            response = HttpResponseNotModified()
+            response['ETag'] = etag
+            self.patch_headers(response)
+            return response
+
+        response = self.get_response(request)
+        if (response.status_code == 200 and not response.streaming and not response.has_header('ETag')
+                and not read_from_replica()):
+            response['ETag'] = etag
+            self.patch_headers(response)
+        return response
+
+    def applies_to(self, request):
+        if request.method not in ('GET', 'HEAD'):
+            return False
+        # The browsable API page shows who is logged in, so it can't share an ETag
+        if 'text/html' in request.headers.get('Accept', ''):
+            return False
+        paths = getattr(settings, 'CATALOG_ETAG_PATHS', ())
+        return any(request.path.startswith(path) for path in paths)
+
+    def catalog_etag(self, request):
+        """Weak ETag for this catalog version, path, normalized query and Accept header."""
+        query = sorted((name, value) for name, values in request.GET.lists() for value in values)
+        representation = '\n'.join((
+            request.get_host(), request.path, urlencode(query), request.headers.get('Accept', ''),
+        ))
+        digest = hashlib.md5(representation.encode(), usedforsecurity=False).hexdigest()[:16]
+        return f'W/"catalog-{get_catalog_version()}-{digest}"'
+
+    def patch_headers(self, response):
+        # Clients may reuse the response, but must revalidate it first
+        patch_cache_control(response, no_cache=True)
+        patch_vary_headers(response, ('Accept',))
+
+
+def accepts_encoding(header, coding):
+    """Whether an Accept-Encoding header allows coding, by name or through `*` (q > 0)."""
+    qualities = {}
+    for name, quality in _ENCODING_RE.findall(header or ''):
+        try:
+            qualities[name.lower()] = float(quality) if quality else 1.0
+        except ValueError:
+            qualities[name.lower()] = 0.0
+    return qualities.get(coding, qualities.get('*', 0.0)) > 0
+
+
+class CompressionMiddleware:
+    """
+    Compress responses of at least RESPONSE_COMPRESSION_MIN_SIZE bytes with
+    brotli (when installed and accepted) or gzip. Small bodies aren't worth
+    the CPU, and streaming responses (the kitchen SSE feed) are left alone so
+    events aren't held back in a compression buffer.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        response = self.get_response(request)
+
+        if response.streaming or response.has_header('Content-Encoding') or response.status_code != 200:
+            return response
+        content_type = response.get('Content-Type', '')
+        if not content_type.startswith(COMPRESSIBLE_TYPES):
+            return response
+
+        # The response depends on Accept-Encoding even when it goes out uncompressed
+        patch_vary_headers(response, ('Accept-Encoding',))
+
+        if len(response.content) < getattr(settings, 'RESPONSE_COMPRESSION_MIN_SIZE', 1024):
+            return response
+
+        accept_encoding = request.headers.get('Accept-Encoding', '')
+        if brotli is not None and accepts_encoding(accept_encoding, 'br'):
+            encoding, compressed = 'br', brotli.compress(response.content, quality=BROTLI_QUALITY)
+        elif accepts_encoding(accept_encoding, 'gzip'):
+            encoding, compressed = 'gzip', compress_string(response.content)
+        else:
+            return response
+
+        if len(compressed) >= len(response.content):
+            return response
+
+        response.content = compressed
+        response['Content-Length'] = str(len(compressed))
+        response['Content-Encoding'] = encoding
+
+        # The compressed bytes differ, so a strong ETag can only be kept as a weak one
+        etag = response.get('ETag')
+        if etag and not etag.startswith('W/'):
+            response['ETag'] = f'W/{etag}'
+        return response
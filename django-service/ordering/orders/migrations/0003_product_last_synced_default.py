@@ -0,0 +1,19 @@
+# Generated by Django 5.2 on 2026-10-17 17:09
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0002_product_is_featured'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='product',
+            name='last_synced',
+            field=models.DateTimeField(default=django.utils.timezone.now),
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.2 on 2026-10-17 17:15
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0004_outboxevent'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='order',
+            name='is_takeaway',
+            field=models.BooleanField(default=False),
+        ),
+        migrations.AddField(
+            model_name='order',
+            name='payment_method',
+            field=models.CharField(blank=True, max_length=20),
+        ),
+    ]
@@ -0,0 +1,54 @@
+# Generated by Django 5.2 on 2026-10-17 17:25
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0006_order_created_status_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='order',
+            name='rolled_up_at',
+            field=models.DateTimeField(blank=True, editable=False, null=True),
+        ),
+        migrations.CreateModel(
+            name='OrderRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('grain', models.CharField(choices=[('hour', 'Hour'), ('day', 'Day')], max_length=4)),
+                ('bucket', models.DateTimeField()),
+                ('delivered_orders', models.PositiveIntegerField(default=0)),
+                ('cancelled_orders', models.PositiveIntegerField(default=0)),
+                ('revenue', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('prep_seconds', models.FloatField(default=0)),
+                ('prep_count', models.PositiveIntegerField(default=0)),
+            ],
+            options={
+                'ordering': ['grain', 'bucket'],
+                'constraints': [models.UniqueConstraint(fields=('grain', 'bucket'), name='order_rollup_bucket_uniq')],
+            },
+        ),
+        migrations.CreateModel(
+            name='ProductRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('grain', models.CharField(choices=[('hour', 'Hour'), ('day', 'Day')], max_length=4)),
+                ('bucket', models.DateTimeField()),
+                ('quantity', models.PositiveIntegerField(default=0)),
+                ('revenue', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('cancelled_quantity', models.PositiveIntegerField(default=0)),
+                ('category', models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='rollups', to='orders.category')),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='rollups', to='orders.product')),
+            ],
+            options={
+                'ordering': ['grain', 'bucket', 'product'],
+                'indexes': [models.Index(fields=['grain', 'category', 'bucket'], name='product_rollup_category_idx')],
+                'constraints': [models.UniqueConstraint(fields=('grain', 'bucket', 'product'), name='product_rollup_bucket_uniq')],
+            },
+        ),
+    ]
@@ -0,0 +1,39 @@
+# Generated by Django 5.2 on 2026-10-17 17:32
+
+from django.conf import settings
+from django.db import migrations, models
+
+from orders.operations import AddIndexConcurrently, RemoveIndexConcurrently
+
+
+class Migration(migrations.Migration):
+    # Indexes are built CONCURRENTLY on PostgreSQL, which can't run in a transaction
+    atomic = False
+
+    dependencies = [
+        ('orders', '0008_order_updated_idx'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        RemoveIndexConcurrently(
+            model_name='order',
+            name='order_status_idx',
+        ),
+        AddIndexConcurrently(
+            model_name='order',
+            index=models.Index(fields=['status', 'created_at'], name='order_status_created_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='order',
+            index=models.Index(fields=['user', 'status', 'created_at'], name='order_user_status_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='order',
+            index=models.Index(condition=models.Q(('status__in', ['DELIVERED', 'CANCELLED']), _negated=True), fields=['status', 'created_at'], name='order_active_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='order',
+            index=models.Index(condition=models.Q(('confirmed_at__isnull', False), ('ready_at__isnull', False)), fields=['created_at'], name='order_prepared_idx'),
+        ),
+    ]
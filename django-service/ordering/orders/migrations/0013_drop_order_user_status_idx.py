@@ -0,0 +1,21 @@
+# Generated by Django 5.2 on 2026-10-17 18:26
+
+from django.db import migrations
+
+from orders.operations import RemoveIndexConcurrently
+
+
+class Migration(migrations.Migration):
+    # order_user_created_idx covers the user's orders and history; dropped CONCURRENTLY on PostgreSQL
+    atomic = False
+
+    dependencies = [
+        ('orders', '0012_order_client_ref'),
+    ]
+
+    operations = [
+        RemoveIndexConcurrently(
+            model_name='order',
+            name='order_user_status_idx',
+        ),
+    ]
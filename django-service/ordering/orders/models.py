@@ -3,15 +3,19 @@
 from django.apps import AppConfig
 from django.db.models.signals import post_save, post_delete
 from django.conf import settings
-from django.db import models
+from django.db import models, transaction
+from django.db.models import F, Sum
+from django.db.models.functions import Coalesce
 from django.contrib.auth import get_user_model
 from django.utils import timezone
 import logging
-import requests
+from decimal import Decimal
 from requests.exceptions import RequestException
 import uuid
 import sys
 
+from .clients import product_service
+
 # Setup
 logger = logging.getLogger(__name__)
 User = get_user_model()
@@ -48,7 +52,7 @@ class OrdersConfig(AppConfig):
             return
 
         try:
-            response = requests.get(f"{product_service_url}/health/", timeout=2)
+            response = product_service.get("/health/", endpoint="health", timeout=2)
             if response.status_code == 200:
                 logger.info(f"Product service is available at {product_service_url}")
             else:
@@ -80,7 +84,7 @@ class Product(models.Model):
     image_url = models.URLField(blank=True)
     is_featured = models.BooleanField(default=False)
     is_available = models.BooleanField(default=True)
-    last_synced = models.DateTimeField(auto_now=True)
+    last_synced = models.DateTimeField(default=timezone.now)
 
     def __str__(self):
         return self.name
@@ -113,6 +117,19 @@ class Product(models.Model):
         return product
 
 
+class InvalidStatusTransition(Exception):
+    """Raised when an order can't move from its status to the requested one."""
+
+
+class StatusConflict(Exception):
+    """Raised when another writer changed an order's status first."""
+
+    def __init__(self, order_id, expected, current):
+        self.expected = expected
+        self.current = current
+        super().__init__(f"Order {order_id} is {current}, not {expected}")
+
+
 class Order(models.Model):
     STATUS_CHOICES = [
         ("PENDING", "Pending"),
@@ -123,6 +140,25 @@ class Order(models.Model):
         ("CANCELLED", "Cancelled"),
     ]
 
+    # Allowed status changes; DELIVERED and CANCELLED are final
+    TRANSITIONS = {
+        "PENDING": ("CONFIRMED", "CANCELLED"),
+        "CONFIRMED": ("PREPARING", "CANCELLED"),
+        "PREPARING": ("READY", "CANCELLED"),
+        "READY": ("DELIVERED", "CANCELLED"),
+        "DELIVERED": (),
+        "CANCELLED": (),
+    }
+    # Statuses an order may be created in; anything later is reached through TRANSITIONS
+    INITIAL_STATUSES = ("PENDING", "CONFIRMED")
+    STATUS_TIMESTAMPS = {
+        "CONFIRMED": "confirmed_at",
+        "PREPARING": "preparing_at",
+        "READY": "ready_at",
+        "DELIVERED": "delivered_at",
+        "CANCELLED": "cancelled_at",
+    }
+
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
     user = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, related_name='orders')
     customer_name = models.CharField(max_length=100, blank=True)
@@ -141,36 +177,78 @@ class Order(models.Model):
     cancelled_at = models.DateTimeField(null=True, blank=True)
     payment_id = models.CharField(max_length=100, blank=True)
     payment_status = models.CharField(max_length=20, blank=True)
+    payment_method = models.CharField(max_length=20, blank=True)
+    is_takeaway = models.BooleanField(default=False)
+    # Set once the order's final state has been added to the sales rollups
+    rolled_up_at = models.DateTimeField(null=True, blank=True, editable=False)
+    # The submitting terminal's own id for the order (batch), so replays are recognized
+    client_ref = models.CharField(max_length=100, null=True, blank=True, editable=False)
 
     def __str__(self):
         return f"Order {self.id} ({self.status})"
 
     def recalculate_total(self):
-        total = sum(item.product.price * item.quantity for item in self.items.all())
-        self.total_price = total
-        self.save(update_fields=['total_price'])
+        """
+        Recompute the total from the items' unit_price snapshots in one query.
+        Totals are kept up to date incrementally (see add_to_total); this is
+        the slow path for repairing drift.
+        """
+        total = self.items.aggregate(
+            total=Coalesce(Sum(F('unit_price') * F('quantity')), 0, output_field=models.DecimalField())
+        )['total']
+        self.total_price = total = Decimal(total).quantize(Decimal('0.01'))
+        self.save(update_fields=['total_price', 'updated_at'])
         return total
 
+    @classmethod
+    def add_to_total(cls, order_id, amount):
+        """
+        Add amount (negative to subtract) to an order's total with a single
+        database-side UPDATE, so concurrent item changes can't overwrite each
+        other's totals.
+        """
+        # Always touches updated_at: item changes move the order on the kitchen board
+        cls.objects.filter(pk=order_id).update(
+            total_price=F('total_price') + amount,
+            updated_at=timezone.now(),
+        )
+
+    def can_transition(self, new_status):
+        return new_status in self.TRANSITIONS.get(self.status, ())
+
     def update_status(self, new_status):
+        """
+        Move the order to new_status with one conditional UPDATE that writes
+        only the status, its timestamp and updated_at, and only if the status
+        is still the one this instance holds.
+
+        Returns False if the order already has new_status. Raises
+        InvalidStatusTransition for a change TRANSITIONS doesn't allow, and
+        StatusConflict (with self.status refreshed) if another writer changed
+        the status first.
+        """
         if new_status == self.status:
             return False
+        if not self.can_transition(new_status):
+            raise InvalidStatusTransition(f"Cannot change order status from {self.status} to {new_status}")
 
-        old_status = self.status
-        self.status = new_status
+        now = timezone.now()
+        changes = {'status': new_status, 'updated_at': now}
+        ts_field = self.STATUS_TIMESTAMPS.get(new_status)
+        if ts_field:
+            changes[ts_field] = now
 
-        timestamp_map = {
-            "CONFIRMED": "confirmed_at",
-            "PREPARING": "preparing_at",
-            "READY": "ready_at",
-            "DELIVERED": "delivered_at",
-            "CANCELLED": "cancelled_at",
-        }
+        old_status = self.status
+        if not Order.objects.filter(pk=self.pk, status=old_status).update(**changes):
+            self.status = Order.objects.filter(pk=self.pk).values_list('status', flat=True).first()
+            raise StatusConflict(self.pk, old_status, self.status)
 
-        ts_field = timestamp_map.get(new_status)
-        if ts_field:
-            setattr(self, ts_field, timezone.now())
+        for field, value in changes.items():
+            setattr(self, field, value)
+        # The UPDATE bypasses save(); run the post_save receivers (events, kitchen feed, rollups)
+        post_save.send(sender=Order, instance=self, created=False, update_fields=frozenset(changes),
+                       raw=False, using=self._state.db)
 
-        self.save()
         logger.info(f"Order {self.id} status changed: {old_status} -> {new_status}")
         return True
 
@@ -194,6 +272,33 @@ class Order(models.Model):
 
     class Meta:
         ordering = ['-created_at']
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'client_ref'], name='order_user_client_ref_uniq',
+                condition=models.Q(client_ref__isnull=False),
+            ),
+        ]
+        indexes = [
+            # Day ranges (stats) and keyset pages of all orders
+            models.Index(fields=['created_at', 'id'], name='order_created_id_idx'),
+            # Keyset pages of a customer's orders and history (also serves the user FK)
+            models.Index(fields=['user', 'created_at', 'id'], name='order_user_created_idx'),
+            # Kitchen board change cursor
+            models.Index(fields=['updated_at'], name='order_updated_idx'),
+            # Status filters and counts, newest/oldest first
+            models.Index(fields=['status', 'created_at'], name='order_status_created_idx'),
+            # Kitchen and active views only read non-terminal orders, a small
+            # fraction of the table (partial index where the backend supports it)
+            models.Index(
+                fields=['status', 'created_at'], name='order_active_idx',
+                condition=~models.Q(status__in=['DELIVERED', 'CANCELLED']),
+            ),
+            # Preparation times only use orders with both timestamps
+            models.Index(
+                fields=['created_at'], name='order_prepared_idx',
+                condition=models.Q(confirmed_at__isnull=False, ready_at__isnull=False),
+            ),
+        ]
 
 
 class OrderItem(models.Model):
@@ -214,10 +319,38 @@ class OrderItem(models.Model):
         if is_new and not self.unit_price:
             self.unit_price = self.product.price
 
-        super().save(*args, **kwargs)
+        update_fields = kwargs.get('update_fields')
+        if not is_new and update_fields is not None and not {'quantity', 'unit_price'} & set(update_fields):
+            # Nothing that changes the subtotal
+            super().save(*args, **kwargs)
+            self.adjust_order_total(0)
+            return
 
-        if is_new or 'quantity' in kwargs.get('update_fields', []):
-            self.order.recalculate_total()
+        with transaction.atomic():
+            previous = 0
+            if not is_new:
+                # Lock the row so concurrent edits of this item apply their deltas in turn
+                saved = OrderItem.objects.select_for_update().filter(pk=self.pk).values_list(
+                    'quantity', 'unit_price'
+                ).first()
+                if saved is not None:
+                    previous = saved[0] * saved[1]
+
+            super().save(*args, **kwargs)
+            # unit_price may still be a float or str as assigned; the column is exact
+            self.adjust_order_total(self.quantity * Decimal(str(self.unit_price)) - previous)
+
+    def delete(self, *args, **kwargs):
+        with transaction.atomic():
+            # Subtract what is stored now, not what this instance last saw
+            self.refresh_from_db(fields=['quantity', 'unit_price'], from_queryset=OrderItem.objects.select_for_update())
+            return super().delete(*args, **kwargs)
+
+    def adjust_order_total(self, amount):
+        """Add amount to the order's total in the database and on a loaded order."""
+        Order.add_to_total(self.order_id, amount)
+        if amount and OrderItem.order.is_cached(self):
+            self.order.total_price = Decimal(str(self.order.total_price or 0)) + amount
 
     def get_subtotal(self):
         return self.quantity * self.unit_price
@@ -232,3 +365,95 @@ class OrderItem(models.Model):
 
     class Meta:
         unique_together = ('order', 'product')
+
+
+class OutboxEvent(models.Model):
+    """
+    Order event waiting to be delivered to the event service.
+    Written in the same transaction as the order change and drained by the
+    dispatch_outbox worker, so order writes never wait on the event service.
+    """
+    event_type = models.CharField(max_length=50)
+    aggregate_id = models.CharField(max_length=100, db_index=True)
+    payload = models.JSONField()
+    created_at = models.DateTimeField(auto_now_add=True)
+    attempts = models.PositiveIntegerField(default=0)
+    next_attempt_at = models.DateTimeField(default=timezone.now)
+    dispatched_at = models.DateTimeField(null=True, blank=True)
+    last_error = models.TextField(blank=True)
+
+    def __str__(self):
+        return f"{self.event_type} for {self.aggregate_id}"
+
+    class Meta:
+        ordering = ['id']
+        indexes = [
+            models.Index(fields=['dispatched_at', 'next_attempt_at'], name='outbox_pending_idx'),
+        ]
+
+
+class OrderTombstone(models.Model):
+    """
+    Record of a deleted order, so kitchen screens polling with ?since= can
+    drop it from their board. Kept for KITCHEN_TOMBSTONE_RETENTION seconds.
+    """
+    order_id = models.UUIDField()
+    deleted_at = models.DateTimeField(default=timezone.now, db_index=True)
+
+    def __str__(self):
+        return f"Order {self.order_id} deleted at {self.deleted_at}"
+
+    class Meta:
+        ordering = ['deleted_at']
+
+
+class OrderRollup(models.Model):
+    """
+    Order totals per time bucket (hour or day, by order creation time).
+    Maintained incrementally as orders are delivered or cancelled.
+    """
+    GRAIN_CHOICES = [("hour", "Hour"), ("day", "Day")]
+
+    grain = models.CharField(max_length=4, choices=GRAIN_CHOICES)
+    bucket = models.DateTimeField()
+    delivered_orders = models.PositiveIntegerField(default=0)
+    cancelled_orders = models.PositiveIntegerField(default=0)
+    revenue = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    # Confirm -> ready time of delivered orders, as a sum and count so means stay exact
+    prep_seconds = models.FloatField(default=0)
+    prep_count = models.PositiveIntegerField(default=0)
+
+    def __str__(self):
+        return f"{self.grain} {self.bucket:%Y-%m-%d %H:%M}"
+
+    class Meta:
+        ordering = ['grain', 'bucket']
+        constraints = [
+            models.UniqueConstraint(fields=['grain', 'bucket'], name='order_rollup_bucket_uniq'),
+        ]
+
+
+class ProductRollup(models.Model):
+    """
+    Items sold per product and time bucket, with the product's category at the
+    time, so per-category reports are a grouping over buckets.
+    """
+    grain = models.CharField(max_length=4, choices=OrderRollup.GRAIN_CHOICES)
+    bucket = models.DateTimeField()
+    product = models.ForeignKey(Product, on_delete=models.PROTECT, related_name='rollups')
+    category = models.ForeignKey(Category, on_delete=models.SET_NULL, null=True, related_name='rollups')
+    quantity = models.PositiveIntegerField(default=0)
+    revenue = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    cancelled_quantity = models.PositiveIntegerField(default=0)
+
+    def __str__(self):
+        return f"{self.product_id} {self.grain} {self.bucket:%Y-%m-%d %H:%M}"
+
+    class Meta:
+        ordering = ['grain', 'bucket', 'product']
+        constraints = [
+            models.UniqueConstraint(fields=['grain', 'bucket', 'product'], name='product_rollup_bucket_uniq'),
+        ]
+        indexes = [
+            models.Index(fields=['grain', 'category', 'bucket'], name='product_rollup_category_idx'),
+        ]
@@ -0,0 +1,60 @@
+# orders/operations.py
+
+from django.db import NotSupportedError
+from django.db.migrations.operations import AddIndex, RemoveIndex
+
+
+def _concurrently(schema_editor):
+    """
+    Index DDL options for the connection: CONCURRENTLY on PostgreSQL, where a
+    plain CREATE/DROP INDEX blocks writes to the table for the whole build.
+    Other backends (SQLite in development) build indexes the normal way.
+    """
+    if schema_editor.connection.vendor != 'postgresql':
+        return {}
+    if schema_editor.connection.in_atomic_block:
+        raise NotSupportedError("Concurrent index operations need a migration with atomic = False.")
+    return {'concurrently': True}
+
+
+class AddIndexConcurrently(AddIndex):
+    """
+    AddIndex built with CREATE INDEX CONCURRENTLY on PostgreSQL, so orders keep
+    being written while it builds. Use in migrations with atomic = False; a
+    failed build leaves an INVALID index to drop before retrying.
+    """
+    atomic = False
+
+    def describe(self):
+        description = super().describe()
+        return f"Concurrently {description[0].lower()}{description[1:]}"
+
+    def database_forwards(self, app_label, schema_editor, from_state, to_state):
+        model = to_state.apps.get_model(app_label, self.model_name)
+        if self.allow_migrate_model(schema_editor.connection.alias, model):
+            schema_editor.add_index(model, self.index, **_concurrently(schema_editor))
+
+    def database_backwards(self, app_label, schema_editor, from_state, to_state):
+        model = from_state.apps.get_model(app_label, self.model_name)
+        if self.allow_migrate_model(schema_editor.connection.alias, model):
+            schema_editor.remove_index(model, self.index, **_concurrently(schema_editor))
+
+
+class RemoveIndexConcurrently(RemoveIndex):
+    """RemoveIndex with DROP INDEX CONCURRENTLY on PostgreSQL (atomic = False migrations)."""
+    atomic = False
+
+    def describe(self):
+        return f"Concurrently remove index {self.name} from {self.model_name}"
+
+    def database_forwards(self, app_label, schema_editor, from_state, to_state):
+        model = from_state.apps.get_model(app_label, self.model_name)
+        if self.allow_migrate_model(schema_editor.connection.alias, model):
+            index = from_state.models[app_label, self.model_name_lower].get_index_by_name(self.name)
+            schema_editor.remove_index(model, index, **_concurrently(schema_editor))
+
+    def database_backwards(self, app_label, schema_editor, from_state, to_state):
+        model = to_state.apps.get_model(app_label, self.model_name)
+        if self.allow_migrate_model(schema_editor.connection.alias, model):
+            index = to_state.models[app_label, self.model_name_lower].get_index_by_name(self.name)
+            schema_editor.add_index(model, index, **_concurrently(schema_editor))
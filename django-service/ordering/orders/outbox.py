@@ -0,0 +1,122 @@
+# orders/outbox.py
+
+import logging
+import random
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.db.models import Exists, OuterRef
+from django.utils import timezone
+from requests.exceptions import RequestException
+
+from .cache import cache_lock
+from .clients import event_service
+from .models import OutboxEvent
+
+logger = logging.getLogger(__name__)
+
+DISPATCH_LOCK_KEY = 'orders:outbox-dispatch:lock'
+
+
+def dispatch_lock(timeout=None):
+    """
+    Hold the dispatcher lock; yields False when another worker holds it.
+    A single active dispatcher is what keeps per-order delivery ordered.
+    """
+    return cache_lock(DISPATCH_LOCK_KEY, timeout or getattr(settings, 'OUTBOX_LOCK_TIMEOUT', 300))
+
+
+class OutboxDispatcher:
+    """
+    Deliver pending OutboxEvent rows to the event service.
+
+    Events are sent in id order. When an event fails it is retried with
+    exponential backoff, and later events for the same order wait behind it
+    so consumers always see an order's events in the order they happened.
+    """
+
+    def __init__(self, batch_size=None, timeout=None):
+        self.batch_size = batch_size or getattr(settings, 'OUTBOX_BATCH_SIZE', 100)
+        self.timeout = timeout or getattr(settings, 'OUTBOX_TIMEOUT', 2)
+        self.base_backoff = getattr(settings, 'OUTBOX_BACKOFF_BASE', 2)
+        self.max_backoff = getattr(settings, 'OUTBOX_BACKOFF_MAX', 300)
+
+    def dispatch_batch(self, deadline=None):
+        """
+        Send one batch of due events, stopping early at deadline (a
+        time.monotonic() value). Returns the number of events attempted.
+        """
+        now = timezone.now()
+
+        # An older event for the same order that is still backing off holds back newer ones
+        waiting_behind = OutboxEvent.objects.filter(
+            aggregate_id=OuterRef('aggregate_id'),
+            dispatched_at__isnull=True,
+            next_attempt_at__gt=now,
+            id__lt=OuterRef('id'),
+        )
+        batch = list(
+            OutboxEvent.objects.filter(dispatched_at__isnull=True, next_attempt_at__lte=now)
+            .exclude(Exists(waiting_behind))
+            .order_by('id')[:self.batch_size]
+        )
+
+        failed = set()
+        attempted = 0
+        for event in batch:
+            if deadline is not None and time.monotonic() >= deadline:
+                break
+            if event.aggregate_id in failed:
+                continue
+            attempted += 1
+
+            if self.send(event):
+                event.dispatched_at = timezone.now()
+                event.save(update_fields=['dispatched_at'])
+            else:
+                event.attempts += 1
+                event.next_attempt_at = timezone.now() + self.backoff(event.attempts)
+                event.save(update_fields=['attempts', 'next_attempt_at', 'last_error'])
+                failed.add(event.aggregate_id)
+
+        return attempted
+
+    def send(self, event):
+        """POST a single event. Returns True when the event service accepted it."""
+        payload = {
+            'id': event.id,
+            'type': event.event_type,
+            'service': getattr(settings, 'SERVICE_NAME', 'orders'),
+            'data': event.payload,
+        }
+
+        try:
+            response = event_service.post(
+                '',
+                endpoint='publish',
+                json=payload,
+                headers={'Content-Type': 'application/json'},
+                timeout=self.timeout
+            )
+        except RequestException as e:
+            event.last_error = str(e)
+            logger.warning(f"Error publishing {event.event_type} event {event.id}: {str(e)}")
+            return False
+
+        if not 200 <= response.status_code < 300:
+            event.last_error = f"Event service returned {response.status_code}"
+            logger.warning(f"Failed to publish {event.event_type} event {event.id}: {response.status_code}")
+            return False
+
+        return True
+
+    def backoff(self, attempts):
+        """Exponential backoff with jitter, capped at max_backoff seconds."""
+        delay = min(self.base_backoff ** attempts, self.max_backoff)
+        return timedelta(seconds=delay * random.uniform(0.5, 1.0))
+
+    def purge(self, older_than):
+        """Delete delivered events dispatched before `older_than`. Returns the count."""
+        deleted, _ = OutboxEvent.objects.filter(dispatched_at__lt=older_than).delete()
+        return deleted
@@ -0,0 +1,109 @@
+# orders/pagination.py
+
+import base64
+import json
+import logging
+import uuid
+
+from django.conf import settings
+from django.db import connections
+from django.utils.dateparse import parse_datetime
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+logger = logging.getLogger(__name__)
+
+
+def estimate_count(queryset):
+    """
+    Row count for a queryset, estimated by the planner where that is cheap
+    (PostgreSQL); other backends count exactly.
+    Returns (count, is_estimate).
+    """
+    connection = connections[queryset.db]
+    if connection.vendor == 'postgresql':
+        try:
+            plan = json.loads(queryset.order_by().explain(format='json'))
+            return int(plan[0]['Plan']['Plan Rows']), True
+        except Exception as e:
+            logger.debug(f"Count estimate failed, counting instead: {str(e)}")
+    return queryset.count(), False
+
+
+class OrderCursorPagination(BasePagination):
+    """
+    Keyset pagination on (created_at, id), newest first.
+
+    The cursor holds the position of the last row returned, so every page is
+    an index range scan of page_size rows however deep it is, there is no
+    COUNT(*) per page, and orders created while paging can't shift or repeat
+    rows. A total is only computed when asked for with ?include_total=1
+    (approximate on PostgreSQL).
+    """
+    cursor_query_param = 'cursor'
+    page_size_query_param = 'page_size'
+    total_query_param = 'include_total'
+    ordering = ('-created_at', '-id')
+
+    def get_page_size(self, request):
+        page_size = getattr(settings, 'REST_FRAMEWORK', {}).get('PAGE_SIZE') or 10
+        try:
+            requested = int(request.query_params.get(self.page_size_query_param, page_size))
+        except ValueError:
+            requested = page_size
+        return max(1, min(requested, getattr(settings, 'ORDER_PAGE_MAX_SIZE', 100)))
+
+    def encode_cursor(self, instance):
+        # Pages hold model instances or values() rows
+        if isinstance(instance, dict):
+            created_at, pk = instance['created_at'], instance['id']
+        else:
+            created_at, pk = instance.created_at, instance.pk
+        position = f"{created_at.isoformat()}|{pk}"
+        return base64.urlsafe_b64encode(position.encode()).decode().rstrip('=')
+
+    def decode_cursor(self, cursor):
+        try:
+            position = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)).decode()
+            created_at, pk = position.split('|', 1)
+            created_at = parse_datetime(created_at)
+            pk = uuid.UUID(pk)
+        except (ValueError, UnicodeDecodeError):
+            created_at = None
+        if created_at is None:
+            raise NotFound("Invalid cursor")
+        return created_at, pk
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        self.total = None
+
+        if request.query_params.get(self.total_query_param) in ('1', 'true', 'True'):
+            self.total = estimate_count(queryset)
+
+        queryset = queryset.order_by(*self.ordering)
+        cursor = request.query_params.get(self.cursor_query_param)
+        if cursor:
+            created_at, pk = self.decode_cursor(cursor)
+            # Range on created_at first so the index scan starts at the cursor
+            queryset = queryset.filter(created_at__lte=created_at).exclude(created_at=created_at, pk__gte=pk)
+
+        rows = list(queryset[:self.page_size + 1])
+        self.has_next = len(rows) > self.page_size
+        self.page = rows[:self.page_size]
+        return self.page
+
+    def get_next_link(self):
+        if not self.has_next or not self.page:
+            return None
+        url = self.request.build_absolute_uri()
+        return replace_query_param(url, self.cursor_query_param, self.encode_cursor(self.page[-1]))
+
+    def get_paginated_response(self, data):
+        response = {'next': self.get_next_link(), 'results': data}
+        if self.total is not None:
+            response['count'], response['count_is_estimate'] = self.total
+        return Response(response)
@@ -0,0 +1,36 @@
+# orders/parsers.py
+
+import orjson
+from django.conf import settings
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import BaseParser, JSONParser
+
+from .renderers import MessagePackRenderer, OrJSONRenderer, msgpack
+
+
+class OrJSONParser(JSONParser):
+    """JSONParser on orjson, for UTF-8 request bodies (anything else goes through the stdlib parser)."""
+    renderer_class = OrJSONRenderer
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        parser_context = parser_context or {}
+        encoding = parser_context.get('encoding', settings.DEFAULT_CHARSET)
+        if encoding.lower().replace('-', '') != 'utf8':
+            return super().parse(stream, media_type, parser_context)
+
+        try:
+            return orjson.loads(stream.read() if stream is not None else b'')
+        except orjson.JSONDecodeError as exc:
+            raise ParseError(f'JSON parse error - {str(exc)}')
+
+
+class MessagePackParser(BaseParser):
+    """Parses `Content-Type: application/msgpack` request bodies."""
+    media_type = 'application/msgpack'
+    renderer_class = MessagePackRenderer
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        try:
+            return msgpack.unpackb(stream.read() if stream is not None else b'', raw=False)
+        except (ValueError, msgpack.ExtraData, msgpack.UnpackException) as exc:
+            raise ParseError(f'MessagePack parse error - {str(exc)}')
@@ -0,0 +1,53 @@
+# orders/renderers.py
+
+import orjson
+from rest_framework.renderers import BaseRenderer, JSONRenderer
+from rest_framework.utils.encoders import JSONEncoder
+
+try:
+    import msgpack
+except ImportError:  # optional: MessagePack is only offered when installed
+    msgpack = None
+
+# Types orjson and msgpack don't know (Decimal, lazy strings, querysets, ...)
+# are converted the way DRF's JSONEncoder converts them
+encode_default = JSONEncoder().default
+
+ORJSON_OPTIONS = orjson.OPT_UTC_Z | orjson.OPT_NON_STR_KEYS
+
+
+class OrJSONRenderer(JSONRenderer):
+    """
+    JSONRenderer on orjson. Datetimes, UUIDs and dict/list subclasses
+    (ReturnDict, ReturnList) are encoded natively and everything else falls
+    back to DRF's encoder, so the output decodes to the same as JSONRenderer's.
+    Differences: `indent` always indents by 2, NaN is written as null, and
+    U+2028/U+2029 are not escaped (valid JSON; JSON.parse accepts them).
+    """
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+
+        options = ORJSON_OPTIONS
+        if self.get_indent(accepted_media_type, renderer_context or {}):
+            options |= orjson.OPT_INDENT_2
+
+        return orjson.dumps(data, default=encode_default, option=options)
+
+
+class MessagePackRenderer(BaseRenderer):
+    """
+    Compact binary responses for clients that send `Accept: application/msgpack`
+    (kitchen screens, POS terminals). Values are the same as in the JSON
+    representation; datetimes and UUIDs are strings.
+    """
+    media_type = 'application/msgpack'
+    format = 'msgpack'
+    charset = None
+    render_style = 'binary'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        return msgpack.packb(data, default=encode_default, use_bin_type=True, datetime=False)
@@ -0,0 +1,228 @@
+# orders/rollups.py
+
+import logging
+from datetime import datetime, timedelta
+from decimal import Decimal
+
+from django.db import IntegrityError, transaction
+from django.db.models import Count, DecimalField, DurationField, ExpressionWrapper, F, Q, Sum
+from django.db.models.functions import Trunc
+from django.utils import timezone
+
+from .models import Order, OrderItem, OrderRollup, ProductRollup
+
+logger = logging.getLogger(__name__)
+
+GRAINS = ('hour', 'day')
+FINAL_STATUSES = ('DELIVERED', 'CANCELLED')
+
+
+def day_start(day):
+    """Aware start of a local calendar day."""
+    return timezone.make_aware(datetime.combine(day, datetime.min.time()))
+
+
+def bucket_start(value, grain):
+    """Start of the local hour or day containing value (matches Trunc in the database)."""
+    local = timezone.localtime(value)
+    if grain == 'day':
+        return day_start(local.date())
+    return local.replace(minute=0, second=0, microsecond=0)
+
+
+def _increment(model, lookup, deltas, defaults=None):
+    """Add deltas to the rollup row matching lookup, creating the row if needed."""
+    if model.objects.filter(**lookup).update(**{name: F(name) + value for name, value in deltas.items()}):
+        return
+    try:
+        with transaction.atomic():
+            model.objects.create(**lookup, **(defaults or {}), **deltas)
+    except IntegrityError:
+        # Another worker created the row first
+        model.objects.filter(**lookup).update(**{name: F(name) + value for name, value in deltas.items()})
+
+
+def _apply(order, sign):
+    """Add (sign=1) or take out (sign=-1) an order's contribution to every grain."""
+    delivered = order.status == 'DELIVERED'
+    order_deltas = {'delivered_orders': sign * int(delivered), 'cancelled_orders': sign * int(not delivered)}
+    if delivered:
+        order_deltas['revenue'] = sign * Decimal(str(order.total_price or 0))
+        if order.confirmed_at and order.ready_at:
+            order_deltas['prep_seconds'] = sign * (order.ready_at - order.confirmed_at).total_seconds()
+            order_deltas['prep_count'] = sign
+
+    items = list(OrderItem.objects.filter(order_id=order.pk).values_list(
+        'product_id', 'product__category_id', 'quantity', 'unit_price'
+    ))
+
+    for grain in GRAINS:
+        bucket = bucket_start(order.created_at, grain)
+        _increment(OrderRollup, {'grain': grain, 'bucket': bucket}, order_deltas)
+
+        for product_id, category_id, quantity, unit_price in items:
+            if delivered:
+                deltas = {'quantity': sign * quantity, 'revenue': sign * unit_price * quantity}
+            else:
+                deltas = {'cancelled_quantity': sign * quantity}
+            _increment(
+                ProductRollup, {'grain': grain, 'bucket': bucket, 'product_id': product_id},
+                deltas, defaults={'category_id': category_id}
+            )
+
+
+@transaction.atomic
+def record_order(order):
+    """
+    Add a delivered or cancelled order to the rollups.
+    The order is claimed with a conditional update on rolled_up_at first, so
+    repeated saves and concurrent workers can't count it twice.
+    Returns True if the order was added.
+    """
+    if order.status not in FINAL_STATUSES:
+        return False
+
+    now = timezone.now()
+    if not Order.objects.filter(pk=order.pk, rolled_up_at__isnull=True).update(rolled_up_at=now):
+        return False
+    order.rolled_up_at = now
+
+    _apply(order, 1)
+    return True
+
+
+def record_created_order(order_id):
+    """
+    on_commit hook for orders created in a final status: roll them up once
+    their items and total have been written, from the committed row.
+    """
+    order = Order.objects.filter(pk=order_id).first()
+    if order is not None:
+        record_order(order)
+
+
+@transaction.atomic
+def unrecord_order(order):
+    """
+    Take a rolled-up order back out of the rollups, e.g. before it is
+    deleted (while its items still exist). Returns True if it was counted.
+    """
+    if not Order.objects.filter(pk=order.pk, rolled_up_at__isnull=False).update(rolled_up_at=None):
+        return False
+    _apply(Order.objects.get(pk=order.pk), -1)
+    return True
+
+
+@transaction.atomic
+def rebuild(start=None, end=None):
+    """
+    Recompute the rollups for orders created in [start, end) from the order tables.
+    Bounds are widened to whole local days so no bucket is left partly rebuilt.
+    Returns the number of orders rolled up.
+    """
+    orders = Order.objects.all()
+    buckets = Q()
+    if start is not None:
+        start = bucket_start(start, 'day')
+        orders = orders.filter(created_at__gte=start)
+        buckets &= Q(bucket__gte=start)
+    if end is not None:
+        if bucket_start(end, 'day') != end:
+            end = day_start(timezone.localtime(end).date() + timedelta(days=1))
+        orders = orders.filter(created_at__lt=end)
+        buckets &= Q(bucket__lt=end)
+
+    OrderRollup.objects.filter(buckets).delete()
+    ProductRollup.objects.filter(buckets).delete()
+
+    # Claim the orders first; anything not final is no longer counted
+    orders.exclude(status__in=FINAL_STATUSES).update(rolled_up_at=None)
+    final = orders.filter(status__in=FINAL_STATUSES)
+    count = final.update(rolled_up_at=timezone.now())
+
+    delivered = Q(status='DELIVERED')
+    prepared = Q(confirmed_at__isnull=False, ready_at__isnull=False)
+    prep_time = ExpressionWrapper(F('ready_at') - F('confirmed_at'), output_field=DurationField())
+    item_revenue = ExpressionWrapper(F('unit_price') * F('quantity'), output_field=DecimalField(max_digits=14, decimal_places=2))
+    items = OrderItem.objects.filter(order__in=final)
+
+    for grain in GRAINS:
+        order_rows = final.annotate(bucket=Trunc('created_at', grain)).values('bucket').annotate(
+            delivered_orders=Count('id', filter=delivered),
+            cancelled_orders=Count('id', filter=~delivered),
+            revenue=Sum('total_price', filter=delivered),
+            prep_time=Sum(prep_time, filter=delivered & prepared),
+            prep_count=Count('id', filter=delivered & prepared),
+        ).order_by()
+
+        OrderRollup.objects.bulk_create([
+            OrderRollup(
+                grain=grain,
+                bucket=row['bucket'],
+                delivered_orders=row['delivered_orders'],
+                cancelled_orders=row['cancelled_orders'],
+                revenue=row['revenue'] or 0,
+                prep_seconds=row['prep_time'].total_seconds() if row['prep_time'] else 0,
+                prep_count=row['prep_count'],
+            )
+            for row in order_rows
+        ])
+
+        product_rows = items.annotate(bucket=Trunc('order__created_at', grain)).values(
+            'bucket', 'product_id', 'product__category_id'
+        ).annotate(
+            sold=Sum('quantity', filter=Q(order__status='DELIVERED')),
+            sold_revenue=Sum(item_revenue, filter=Q(order__status='DELIVERED')),
+            cancelled=Sum('quantity', filter=Q(order__status='CANCELLED')),
+        ).order_by()
+
+        ProductRollup.objects.bulk_create([
+            ProductRollup(
+                grain=grain,
+                bucket=row['bucket'],
+                product_id=row['product_id'],
+                category_id=row['product__category_id'],
+                quantity=row['sold'] or 0,
+                revenue=row['sold_revenue'] or 0,
+                cancelled_quantity=row['cancelled'] or 0,
+            )
+            for row in product_rows
+        ])
+
+    logger.info(f"Rebuilt sales rollups from {count} orders")
+    return count
+
+
+def sales_series(grain, start, end):
+    """Order totals per bucket in [start, end)."""
+    rows = OrderRollup.objects.filter(grain=grain, bucket__gte=start, bucket__lt=end).order_by('bucket')
+    return [{
+        'bucket': row.bucket.isoformat(),
+        'delivered_orders': row.delivered_orders,
+        'cancelled_orders': row.cancelled_orders,
+        'revenue': row.revenue,
+        'avg_preparation_time': round(row.prep_seconds / row.prep_count / 60, 1) if row.prep_count else None,
+    } for row in rows]
+
+
+def product_totals(start, end, group_by='product'):
+    """Items sold in [start, end) per product or per category, summed over the daily buckets."""
+    key, name = ('category_id', 'category__name') if group_by == 'category' else ('product_id', 'product__name')
+
+    rows = (
+        ProductRollup.objects.filter(grain='day', bucket__gte=start, bucket__lt=end)
+        .values(key, name)
+        .annotate(
+            total_quantity=Sum('quantity'),
+            total_revenue=Sum('revenue'),
+            total_cancelled=Sum('cancelled_quantity'),
+        )
+        .order_by('-total_revenue')
+    )
+    return [{
+        key: row[key],
+        'name': row[name],
+        'quantity': row['total_quantity'],
+        'revenue': row['total_revenue'],
+        'cancelled_quantity': row['total_cancelled'],
+    } for row in rows]
@@ -0,0 +1,174 @@
+# orders/routing.py
+
+import contextvars
+import random
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connections
+
+# Per-request routing state, set by ReadYourWritesMiddleware
+_request_state = contextvars.ContextVar('orders_db_routing', default=None)
+
+PIN_COOKIE = 'orders_db_pin'
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+
+
+def replica_aliases():
+    return [alias for alias in settings.DATABASES if alias.startswith('replica')]
+
+
+def _pin_key(user_id):
+    return f"orders:db-pin:{user_id}"
+
+
+def pin_seconds():
+    return getattr(settings, 'REPLICA_PIN_SECONDS', 10)
+
+
+@contextmanager
+def replica_reads():
+    """
+    Let order reads in the block (or decorated view) go to a replica,
+    e.g. history and stats; catalog reads always may.
+    """
+    state = _request_state.get()
+    if state is None:
+        yield
+        return
+
+    previous = state['replica_reads']
+    state['replica_reads'] = True
+    try:
+        yield
+    finally:
+        state['replica_reads'] = previous
+
+
+@contextmanager
+def primary_reads():
+    """
+    Read from the primary in the block, e.g. while building a cached catalog
+    response whose key carries the primary's catalog version.
+    """
+    state = _request_state.get()
+    if state is None:
+        yield
+        return
+
+    previous = state['primary_reads']
+    state['primary_reads'] = True
+    try:
+        yield
+    finally:
+        state['primary_reads'] = previous
+
+
+def read_from_replica():
+    """True when the current request has read anything from a replica."""
+    state = _request_state.get()
+    return bool(state and state['replica_used'])
+
+
+def in_primary_transaction():
+    """True inside an atomic block on the primary (test case wrappers aside)."""
+    return any(not block._from_testcase for block in connections['default'].atomic_blocks)
+
+
+def is_pinned(state):
+    """
+    True while the request's user must read from the primary: they wrote in
+    this request, or within REPLICA_PIN_SECONDS before it (pin cookie, or a
+    per-user pin in the shared cache for clients without cookies).
+    """
+    if state['pinned']:
+        return True
+
+    request = state['request']
+    user = getattr(request, 'user', None)
+    if user is not None and getattr(user, 'is_authenticated', False) and state.get('user_checked') != user.pk:
+        state['user_checked'] = user.pk
+        state['pinned'] = bool(cache.get(_pin_key(user.pk)))
+    return state['pinned']
+
+
+class ReplicaRouter:
+    """
+    Send reads that tolerate replication lag to the replica aliases
+    (replica_1, replica_2, ...): catalog reads (Product, Category) and reads
+    inside replica_reads(), in GET/HEAD/OPTIONS requests. Everything else, all
+    writes, reads in unsafe requests, inside a transaction on the primary or
+    inside primary_reads(), and all reads outside a request (workers,
+    commands) use the primary. A user who has just written is pinned to the
+    primary so they always see their own orders.
+    """
+    replica_models = ('product', 'category')
+
+    def __init__(self):
+        self.replicas = replica_aliases()
+
+    def db_for_read(self, model, **hints):
+        state = _request_state.get()
+        if not self.replicas or state is None:
+            return None
+        # Write paths check and update what they read, so they need current rows
+        if state['request'].method not in SAFE_METHODS or state['primary_reads'] or in_primary_transaction():
+            return None
+
+        routed = model._meta.model_name in self.replica_models or state['replica_reads']
+        if model._meta.app_label != 'orders' or not routed or is_pinned(state):
+            return None
+        state['replica_used'] = True
+        return random.choice(self.replicas)
+
+    def db_for_write(self, model, **hints):
+        state = _request_state.get()
+        if state is not None:
+            # Later reads in this request must see this write
+            state['pinned'] = True
+            state['wrote'] = True
+        return 'default'
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Replicas hold the same data as the primary
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # Replicas get their schema through replication
+        return db == 'default'
+
+
+class ReadYourWritesMiddleware:
+    """
+    Set up replica routing for each request, and pin the user to the primary
+    for REPLICA_PIN_SECONDS after a request that wrote.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        state = {
+            'request': request,
+            'pinned': PIN_COOKIE in request.COOKIES,
+            'replica_reads': False,
+            'primary_reads': False,
+            'replica_used': False,
+            'wrote': False,
+        }
+        token = _request_state.set(state)
+        try:
+            response = self.get_response(request)
+        finally:
+            _request_state.reset(token)
+
+        if state['wrote'] or (request.method not in SAFE_METHODS and response.status_code < 400):
+            seconds = pin_seconds()
+            response.set_cookie(PIN_COOKIE, '1', max_age=seconds, httponly=True, samesite='Lax')
+            # Token-authenticated clients may not keep cookies
+            user = getattr(request, 'user', None)
+            if user is not None and getattr(user, 'is_authenticated', False):
+                cache.set(_pin_key(user.pk), True, seconds)
+
+        return response
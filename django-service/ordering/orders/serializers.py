@@ -1,6 +1,22 @@
 from rest_framework import serializers
+from django.db import transaction
+from django.db.models import Prefetch, prefetch_related_objects
 from django.utils import timezone
 from .models import Category, Product, Order, OrderItem
+from .rollups import FINAL_STATUSES, record_order
+from .signals import publish_orders_created
+
+def transition_error(order, new_status):
+    """Message for a status the order can't move to from its current one, else None."""
+    if new_status == order.status or order.can_transition(new_status):
+        return None
+    allowed = ', '.join(Order.TRANSITIONS.get(order.status, ())) or 'none, it is final'
+    return f"Cannot change status from {order.status} to {new_status} (allowed: {allowed})"
+
+def initial_status_fields(status):
+    """Timestamp for an order created directly in status, e.g. confirmed_at for CONFIRMED."""
+    ts_field = Order.STATUS_TIMESTAMPS.get(status)
+    return {ts_field: timezone.now()} if ts_field else {}
 
 class CategorySerializer(serializers.ModelSerializer):
     """Serializer for product categories."""
@@ -28,8 +44,20 @@ class ProductSerializer(serializers.ModelSerializer):
             raise serializers.ValidationError("Price must be a positive value.")
         return value
 
+class PreloadedProductField(serializers.PrimaryKeyRelatedField):
+    """
+    Product reference that resolves against products preloaded into the
+    serializer context, so a cart of N items costs one lookup instead of N.
+    """
+    def to_internal_value(self, data):
+        preloaded = self.context.get('preloaded_products')
+        if preloaded is not None and str(data) in preloaded:
+            return preloaded[str(data)]
+        return super().to_internal_value(data)
+
 class OrderItemSerializer(serializers.ModelSerializer):
     """Serializer for individual items within an order."""
+    product = PreloadedProductField(queryset=Product.objects.all())
     product_details = ProductSerializer(source='product', read_only=True)
     subtotal = serializers.DecimalField(
         max_digits=10, decimal_places=2, 
@@ -57,6 +85,38 @@ class OrderItemSerializer(serializers.ModelSerializer):
             raise serializers.ValidationError(f"Product '{value.name}' is currently unavailable.")
         return value
 
+class OrderListSerializer(serializers.ListSerializer):
+    """Bulk creation for many orders at once (batch submission)."""
+
+    @transaction.atomic
+    def create(self, validated_data):
+        """Insert all orders, then all their items, with totals computed up front."""
+        orders = []
+        items = []
+        for order_data in validated_data:
+            order_data = dict(order_data)
+            order = Order(
+                **{key: value for key, value in order_data.items() if key != 'items'},
+                **initial_status_fields(order_data.get('status')),
+            )
+            order_items = [
+                OrderItem(order=order, unit_price=item_data['product'].price, **item_data)
+                for item_data in self.child.merge_items(order_data['items'])
+            ]
+            order.total_price = sum(item.unit_price * item.quantity for item in order_items)
+            orders.append(order)
+            items.extend(order_items)
+
+        Order.objects.bulk_create(orders)
+        OrderItem.objects.bulk_create(items)
+
+        # Bulk inserts skip model signals, so publish the events and roll up final orders here
+        publish_orders_created(orders, items)
+        for order in orders:
+            if order.status in FINAL_STATUSES:
+                record_order(order)
+        return orders
+
 class OrderSerializer(serializers.ModelSerializer):
     """Serializer for customer orders with nested items."""
     items = OrderItemSerializer(many=True)
@@ -74,49 +134,93 @@ class OrderSerializer(serializers.ModelSerializer):
             'payment_id', 'payment_status', 'payment_method', 'is_takeaway',
             'preparation_time', 'delivery_time', 'total_time'
         ]
+        list_serializer_class = OrderListSerializer
         read_only_fields = [
             'id', 'created_at', 'updated_at', 'confirmed_at', 'preparing_at', 
             'ready_at', 'delivered_at', 'cancelled_at', 'total_price',
             'payment_id', 'payment_status'
         ]
 
+    def to_internal_value(self, data):
+        """Load every product referenced by the items in a single query."""
+        items = data.get('items') if hasattr(data, 'get') else None
+        if isinstance(items, list):
+            preloaded = self.context.setdefault('preloaded_products', {})
+            product_ids = {
+                str(item['product']) for item in items
+                if isinstance(item, dict) and str(item.get('product', '')).isdigit()
+            } - preloaded.keys()
+            if product_ids:
+                preloaded.update(
+                    (str(pk), product) for pk, product in
+                    Product.objects.select_related('category').in_bulk(product_ids).items()
+                )
+        return super().to_internal_value(data)
+
+    @transaction.atomic
     def create(self, validated_data):
-        """Create order with nested items and calculate total price."""
-        items_data = validated_data.pop('items')
+        """
+        Create order with nested items and calculate total price.
+        Runs a fixed number of queries whatever the cart size: one insert for
+        the order, one bulk insert for the items and one update for the total.
+        """
+        items_data = self.merge_items(validated_data.pop('items'))
         
         # Create the order
-        order = Order.objects.create(**validated_data)
+        order = Order.objects.create(**validated_data, **initial_status_fields(validated_data.get('status')))
         
-        # Create order items
-        for item_data in items_data:
-            product = item_data['product']
-            quantity = item_data['quantity']
-            
-            # Create the order item with unit price
-            OrderItem.objects.create(
-                order=order,
-                unit_price=product.price,
-                **item_data
-            )
+        # Snapshot the current price on each item and insert them together
+        items = [
+            OrderItem(order=order, unit_price=item_data['product'].price, **item_data)
+            for item_data in items_data
+        ]
+        OrderItem.objects.bulk_create(items)
+        
+        # Total from the unit_price snapshots, written once
+        order.total_price = sum(item.unit_price * item.quantity for item in items)
+        order.save(update_fields=['total_price', 'updated_at'])
         
-        # Recalculate total (will be done automatically by OrderItem.save)
-        order.recalculate_total()
+        # Load items for the response in one query instead of one per item
+        prefetch_related_objects(
+            [order], Prefetch('items', queryset=OrderItem.objects.select_related('product__category'))
+        )
         
         return order
 
+    def merge_items(self, items_data):
+        """Merge lines for the same product so they don't trip unique_together."""
+        merged = {}
+        for item_data in items_data:
+            product = item_data['product']
+            if product.pk not in merged:
+                merged[product.pk] = dict(item_data)
+                continue
+            
+            line = merged[product.pk]
+            line['quantity'] = line.get('quantity', 1) + item_data.get('quantity', 1)
+            instructions = item_data.get('special_instructions')
+            if instructions and instructions not in line.get('special_instructions', ''):
+                line['special_instructions'] = '; '.join(
+                    filter(None, [line.get('special_instructions'), instructions])
+                )[:255]
+        return list(merged.values())
+
+    @transaction.atomic
     def update(self, instance, validated_data):
         """Update order with support for adding, modifying, and removing items."""
         items_data = validated_data.pop('items', None)
         
+        new_status = validated_data.pop('status', None)
+        
         # Update order fields
         for attr, value in validated_data.items():
             setattr(instance, attr, value)
+        if validated_data:
+            instance.save(update_fields=[*validated_data, 'updated_at'])
         
-        # Update status with timestamp tracking
-        if 'status' in validated_data and validated_data['status'] != instance.status:
-            instance.update_status(validated_data['status'])
-        else:
-            instance.save()
+        # Conditional status change with timestamp tracking
+        if new_status:
+            instance.update_status(new_status)
         
         # Handle items if provided
         if items_data is not None:
@@ -151,8 +255,8 @@ class OrderSerializer(serializers.ModelSerializer):
                 if item_id not in updated_item_ids:
                     item.delete()
             
-            # Recalculate total price
-            instance.recalculate_total()
+            # Each item change already moved the total in the database
+            instance.refresh_from_db(fields=['total_price', 'updated_at'])
         
         return instance
 
@@ -164,6 +268,13 @@ class OrderSerializer(serializers.ModelSerializer):
             raise serializers.ValidationError({
                 "status": f"Invalid status. Must be one of: {', '.join(status_options)}"
             })
+        error = transition_error(self.instance, data['status']) if 'status' in data and self.instance else None
+        if error:
+            raise serializers.ValidationError({"status": error})
+        if 'status' in data and not self.instance and data['status'] not in Order.INITIAL_STATUSES:
+            raise serializers.ValidationError({
+                "status": f"New orders must start as one of: {', '.join(Order.INITIAL_STATUSES)}"
+            })
         
         # Validate items exist
         if 'items' in data and not data.get('items'):
@@ -204,6 +315,9 @@ class OrderStatusSerializer(serializers.ModelSerializer):
             raise serializers.ValidationError(
                 f"Invalid status. Choose from: {', '.join(allowed)}"
             )
+        error = transition_error(self.instance, value) if self.instance else None
+        if error:
+            raise serializers.ValidationError(error)
         return value
         
     def update(self, instance, validated_data):
@@ -215,38 +329,6 @@ class OrderStatusSerializer(serializers.ModelSerializer):
             
         return instance
 
-class KitchenOrderSerializer(serializers.ModelSerializer):
-    """Simplified serializer for kitchen display systems."""
-    items = serializers.SerializerMethodField()
-    time_elapsed = serializers.SerializerMethodField()
-    
-    class Meta:
-        model = Order
-        fields = [
-            'id', 'status', 'table_number', 'customer_name',
-            'items', 'special_requests', 'is_takeaway',
-            'created_at', 'confirmed_at', 'time_elapsed'
-        ]
-    
-    def get_items(self, obj):
-        """Get simplified item representation for kitchen."""
-        return [{
-            'id': item.id,
-            'name': item.product.name,
-            'quantity': item.quantity,
-            'instructions': item.special_instructions,
-            'is_prepared': item.is_prepared,
-            'category': item.product.category.name if item.product.category else 'Uncategorized'
-        } for item in obj.items.all()]
-    
-    def get_time_elapsed(self, obj):
-        """Get minutes elapsed since order confirmation."""
-        if not obj.confirmed_at:
-            return 0
-        
-        elapsed = timezone.now() - obj.confirmed_at
-        return int(elapsed.total_seconds() // 60)
-
 class OrderEventSerializer(serializers.ModelSerializer):
     """Serializer for publishing order events to other services."""
     order_id = serializers.UUIDField(source='id')
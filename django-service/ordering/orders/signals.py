@@ -1,95 +1,249 @@
 # orders/signals.py
 
-import json
 import logging
-import requests
+import threading
+from datetime import timedelta
+from functools import partial
 from django.conf import settings
-from django.db.models.signals import post_save, post_delete
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete, pre_delete
 from django.dispatch import receiver
-from requests.exceptions import RequestException
-from .models import Order, OrderItem  # Ensure you import the actual models
+from django.utils import timezone
+from .models import Order, OrderItem, OrderTombstone, OutboxEvent
+from .kitchen import kitchen_feed
+from .rollups import FINAL_STATUSES, record_created_order, record_order, unrecord_order
 
 logger = logging.getLogger(__name__)
 
+# Per-thread buffer of the orders touched by the current transaction
+_local = threading.local()
+
 def publish_event(event_type, event_data):
     """
     Publish an event to other microservices.
-    In production, use message brokers like Kafka/RabbitMQ.
-    This uses HTTP webhooks for simplicity.
+    The event is written to the outbox in the caller's transaction and
+    delivered by the dispatch_outbox worker, so a slow or failing event
+    service never blocks or loses an order write.
     """
-    if not hasattr(settings, 'EVENT_SERVICE_URL'):
+    if not getattr(settings, 'EVENT_SERVICE_URL', ''):
         logger.debug(f"Skipping event publishing for {event_type} (no EVENT_SERVICE_URL configured)")
         return
 
-    try:
-        payload = {
-            'type': event_type,
-            'service': getattr(settings, 'SERVICE_NAME', 'orders'),
-            'data': event_data
-        }
-
-        response = requests.post(
-            settings.EVENT_SERVICE_URL,
-            json=payload,
-            headers={'Content-Type': 'application/json'},
-            timeout=1
+    OutboxEvent.objects.create(
+        event_type=event_type,
+        aggregate_id=event_data.get('order_id', ''),
+        payload=event_data,
+    )
+
+def order_event_data(order, items=None):
+    """Build the event payload for an order, optionally with its item list."""
+    event_data = {
+        'order_id': str(order.id),
+        'status': order.status,
+        'total_price': float(order.total_price) if order.total_price else 0,
+        'user_id': order.user_id,
+        'created_at': order.created_at.isoformat() if order.created_at else None,
+        'updated_at': order.updated_at.isoformat() if order.updated_at else None,
+    }
+
+    if items is not None:
+        event_data['items'] = [{
+            'item_id': item.id,
+            'product_id': item.product_id,
+            'quantity': item.quantity,
+            'unit_price': float(item.unit_price),
+        } for item in items]
+        event_data['item_count'] = len(event_data['items'])
+
+    return event_data
+
+def publish_orders_created(orders, items):
+    """Write order.created events for orders inserted in bulk, in one query."""
+    if not getattr(settings, 'EVENT_SERVICE_URL', ''):
+        return
+
+    items_by_order = {}
+    for item in items:
+        items_by_order.setdefault(item.order_id, []).append(item)
+
+    OutboxEvent.objects.bulk_create([
+        OutboxEvent(
+            event_type='order.created',
+            aggregate_id=str(order.id),
+            payload=order_event_data(order, items_by_order.get(order.id, [])),
+        )
+        for order in orders
+    ])
+
+def _pending_orders():
+    """
+    Return the buffer of orders changed in the current transaction.
+    A buffer belongs to the transaction that registered its flush callback;
+    if that callback is gone (the work was rolled back) a fresh one is started.
+    """
+    buffer = getattr(_local, 'buffer', None)
+    registered = transaction.get_connection().run_on_commit
+    if buffer is None or not any(entry[1] is buffer['flush'] for entry in registered):
+        buffer = {'orders': {}}
+        buffer['flush'] = partial(_flush_order_events, buffer)
+        _local.buffer = buffer
+        transaction.on_commit(buffer['flush'], robust=True)
+    return buffer['orders']
+
+def record_order_event(order, created=False, deleted=False):
+    """
+    Record that an order changed, coalescing all changes made to it in the
+    current transaction into a single outbox event.
+
+    The first change inserts the outbox row (so it commits with the order);
+    later changes only touch the buffer. Once the transaction commits the row
+    is rewritten with the final order state and item list and released to the
+    dispatcher. Rolled-back work takes its outbox row with it.
+    """
+    if not getattr(settings, 'EVENT_SERVICE_URL', ''):
+        return
+
+    if not transaction.get_connection().in_atomic_block:
+        # Autocommit: nothing to coalesce with
+        event_type = 'order.deleted' if deleted else ('order.created' if created else 'order.updated')
+        publish_event(event_type, order_event_data(order))
+        return
+
+    orders = _pending_orders()
+    key = str(order.id)
+    pending = orders.get(key)
+
+    if pending is None:
+        hold = timedelta(seconds=getattr(settings, 'OUTBOX_COALESCE_HOLD', 5))
+        event = OutboxEvent.objects.create(
+            event_type='order.deleted' if deleted else ('order.created' if created else 'order.updated'),
+            aggregate_id=key,
+            payload=order_event_data(order),
+            # Held back until the commit hook writes the final payload
+            next_attempt_at=timezone.now() + hold,
         )
+        orders[key] = {'event_id': event.id, 'created': created, 'deleted': deleted, 'user_id': order.user_id}
+    else:
+        pending['created'] = pending['created'] or created
+        pending['deleted'] = pending['deleted'] or deleted
+
+def _flush_order_events(buffer):
+    """
+    Commit hook: write one consolidated event per order changed in the transaction.
+    The buffer may outlive work rolled back to a savepoint, so the event type is
+    taken from what was committed, and held rows that were rolled back with that
+    work are inserted again.
+    """
+    pending_orders = buffer['orders']
+    if not pending_orders:
+        return
+
+    now = timezone.now()
+    events = OutboxEvent.objects.in_bulk([pending['event_id'] for pending in pending_orders.values()])
+    orders = {str(order.id): order for order in Order.objects.filter(id__in=list(pending_orders))}
+    items_by_order = {}
+    for item in OrderItem.objects.filter(order_id__in=list(orders)).order_by('id'):
+        items_by_order.setdefault(str(item.order_id), []).append(item)
 
-        if response.status_code != 200:
-            logger.warning(f"Failed to publish {event_type} event: {response.status_code}")
-    except RequestException as e:
-        logger.warning(f"Error publishing {event_type} event: {str(e)}")
+    to_create = []
+    to_update = []
+    to_delete = []
+    for order_id, pending in pending_orders.items():
+        event = events.get(pending['event_id'])
+        order = orders.get(order_id)
+
+        if order is None and pending['created']:
+            # Created and deleted (or rolled back) in the same transaction: nothing happened
+            if event is not None:
+                to_delete.append(event.id)
+            continue
+
+        if event is None:
+            event = OutboxEvent(aggregate_id=order_id)
+            to_create.append(event)
+        else:
+            to_update.append(event)
+
+        if order is None:
+            event.event_type = 'order.deleted'
+            event.payload = {'order_id': order_id, 'user_id': pending['user_id']}
+        else:
+            event.event_type = 'order.created' if pending['created'] else 'order.updated'
+            event.payload = order_event_data(order, items_by_order.get(order_id, []))
+        event.next_attempt_at = now
+
+    if to_delete:
+        OutboxEvent.objects.filter(id__in=to_delete).delete()
+    if to_update:
+        OutboxEvent.objects.bulk_update(to_update, ['event_type', 'payload', 'next_attempt_at'])
+    if to_create:
+        OutboxEvent.objects.bulk_create(to_create)
+
+    logger.debug(f"Flushed {len(to_update) + len(to_create)} coalesced order events")
 
 @receiver(post_save, sender=Order)
 def order_post_save(sender, instance, created, **kwargs):
     """
     Handle order creation and updates.
     """
-    event_data = {
-        'order_id': str(instance.id),
-        'status': instance.status,
-        'total_price': float(instance.total_price) if instance.total_price else 0,
-        'user_id': instance.user.id if instance.user else None,
-        'created_at': instance.created_at.isoformat() if instance.created_at else None,
-        'updated_at': instance.updated_at.isoformat() if instance.updated_at else None,
-    }
+    record_order_event(instance, created=created)
+    transaction.on_commit(kitchen_feed.notify)
+
+    # Delivered and cancelled orders are added to the sales rollups once; an order
+    # created final has no items or total yet, so it waits for the commit
+    if instance.status in FINAL_STATUSES and instance.rolled_up_at is None:
+        if created:
+            transaction.on_commit(partial(record_created_order, instance.pk), robust=True)
+        else:
+            record_order(instance)
 
     if created:
-        publish_event('order.created', event_data)
         logger.info(f"Order created: {instance.id}")
     else:
-        publish_event('order.updated', event_data)
         logger.info(f"Order updated: {instance.id} (status: {instance.status})")
 
+@receiver(pre_delete, sender=Order)
+def order_pre_delete(sender, instance, **kwargs):
+    """Take a rolled-up order out of the sales rollups while its items still exist."""
+    # Checked in the database: the instance may predate the rollup
+    unrecord_order(instance)
+
 @receiver(post_delete, sender=Order)
 def order_post_delete(sender, instance, **kwargs):
     """
     Handle order deletion.
+    Leaves a tombstone for kitchen_view deltas and prunes the expired ones.
     """
-    event_data = {
-        'order_id': str(instance.id),
-        'user_id': instance.user.id if instance.user else None,
-    }
-
-    publish_event('order.deleted', event_data)
+    now = timezone.now()
+    retention = timedelta(seconds=getattr(settings, 'KITCHEN_TOMBSTONE_RETENTION', 86400))
+    OrderTombstone.objects.filter(deleted_at__lt=now - retention).delete()
+    OrderTombstone.objects.create(order_id=instance.id, deleted_at=now)
+    record_order_event(instance, deleted=True)
+    transaction.on_commit(kitchen_feed.notify)
     logger.info(f"Order deleted: {instance.id}")
 
 @receiver(post_save, sender=OrderItem)
 def order_item_post_save(sender, instance, created, **kwargs):
     """
     Handle order item creation and updates.
+    The order total was already adjusted by OrderItem.save; item changes are
+    folded into the order's event rather than published alone.
     """
     order = instance.order
-    if hasattr(order, 'recalculate_total'):
-        order.recalculate_total()
+    record_order_event(order)
 
     if created:
-        event_data = {
-            'order_id': str(order.id),
-            'item_id': str(instance.id),
-            'product_id': instance.product.id if instance.product else None,
-            'quantity': instance.quantity,
-        }
-
-        publish_event('order_item.created', event_data)
         logger.debug(f"Order item created: {instance.id} for order {order.id}")
+
+@receiver(post_delete, sender=OrderItem)
+def order_item_post_delete(sender, instance, origin=None, **kwargs):
+    """
+    Take a deleted item's subtotal off its order's total.
+    Covers item.delete() and queryset deletes; items deleted along with
+    their order are skipped.
+    """
+    if isinstance(origin, Order) or getattr(origin, 'model', None) is Order:
+        return
+
+    instance.adjust_order_total(-instance.get_subtotal())
+    record_order_event(instance.order)
@@ -0,0 +1,252 @@
+# orders/sync.py
+
+import logging
+import time
+from datetime import timedelta
+from decimal import Decimal, InvalidOperation
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Max
+from django.utils import timezone
+
+from .cache import bump_catalog_version, cache_lock
+from .clients import product_service
+from .models import Category, Product
+
+logger = logging.getLogger(__name__)
+
+# Fields copied from the product service onto the local Product row
+SYNCED_FIELDS = ['name', 'price', 'description', 'category', 'image_url', 'is_available']
+
+SYNC_LOCK_KEY = 'orders:catalog-sync:lock'
+
+
+class ProductServiceError(Exception):
+    """Raised when the product service answers with an unexpected status."""
+
+
+class SyncDeadlineExceeded(Exception):
+    """Raised when a sync is still fetching at its deadline; nothing has been applied."""
+
+
+def sync_lock(timeout=None):
+    """Hold the catalog sync lock; yields False when another worker holds it."""
+    return cache_lock(SYNC_LOCK_KEY, timeout or getattr(settings, 'CATALOG_SYNC_LOCK_TIMEOUT', 600))
+
+
+class CatalogSyncEngine:
+    """
+    Set-based catalog sync.
+
+    Pages through the product service catalog, resolves categories in memory,
+    diffs incoming rows against the existing external_ids and writes only the
+    changes with bulk_create/bulk_update inside a single transaction.
+
+    In delta mode only rows changed since the last sync point are requested;
+    tombstones (rows flagged `deleted`, or ids in a top-level `deleted` list)
+    mark the local product unavailable.
+    """
+
+    def __init__(self, page_size=500, batch_size=500, timeout=10):
+        self.page_size = page_size
+        self.batch_size = batch_size
+        self.timeout = timeout
+
+    def fetch_pages(self, since=None):
+        """Yield the catalog one page at a time, following `next` links."""
+        url = "/api/products/"
+        params = {'limit': self.page_size}
+        if since:
+            params['since'] = since.isoformat()
+
+        while url:
+            response = product_service.get(url, endpoint='catalog', params=params, timeout=self.timeout)
+            if response.status_code != 200:
+                raise ProductServiceError(f"Product service returned {response.status_code}")
+
+            payload = response.json()
+            if isinstance(payload, list):
+                # Unpaginated response: the whole catalog in one document
+                yield payload
+                return
+
+            rows = payload.get('results', [])
+            rows.extend({'id': external_id, 'deleted': True} for external_id in payload.get('deleted', []))
+            yield rows
+
+            # `next` already carries the query string
+            url = payload.get('next')
+            params = None
+
+    def last_sync_point(self):
+        """
+        Return the timestamp to request changes from, or None for a full sync.
+        Rows are stamped with the start time of the sync that wrote them, so the
+        newest last_synced is a safe lower bound; a small overlap absorbs clock skew.
+        """
+        last_synced = Product.objects.using('default').aggregate(last=Max('last_synced'))['last']
+        if last_synced is None:
+            return None
+        overlap = getattr(settings, 'CATALOG_SYNC_OVERLAP', 60)
+        return last_synced - timedelta(seconds=overlap)
+
+    def run(self, since=None, deadline=None):
+        """
+        Fetch the catalog (or the changes since `since`) and apply it. Returns
+        the sync report. Raises SyncDeadlineExceeded if the fetch is still going
+        at deadline (a time.monotonic() value), before anything is written.
+        """
+        started_at = timezone.now()
+        products_data = []
+        for page in self.fetch_pages(since):
+            products_data.extend(page)
+            if deadline is not None and time.monotonic() >= deadline:
+                raise SyncDeadlineExceeded(f"Catalog fetch not done by its deadline ({len(products_data)} rows read)")
+        report = self.apply(products_data, synced_at=started_at)
+        report['mode'] = 'delta' if since else 'full'
+        return report
+
+    def run_delta(self, deadline=None):
+        """Apply only what changed since the last successful sync."""
+        return self.run(since=self.last_sync_point(), deadline=deadline)
+
+    def apply(self, products_data, synced_at=None):
+        """
+        Apply a list of product service rows to the local catalog.
+        Returns a report with created/updated/unchanged/removed/skipped counts.
+        """
+        report = {'created': 0, 'updated': 0, 'unchanged': 0, 'removed': 0, 'skipped': 0}
+
+        # Normalize and de-duplicate on external_id (last row wins)
+        incoming = {}
+        tombstones = set()
+        for product_data in products_data:
+            if product_data.get('deleted') and product_data.get('id'):
+                external_id = str(product_data['id'])
+                tombstones.add(external_id)
+                incoming.pop(external_id, None)
+                continue
+
+            row = self._normalize(product_data)
+            if row is None:
+                report['skipped'] += 1
+                continue
+            incoming[row['external_id']] = row
+            tombstones.discard(row['external_id'])
+
+        if not incoming and not tombstones:
+            report['total'] = 0
+            return report
+
+        now = synced_at or timezone.now()
+
+        with transaction.atomic():
+            if tombstones:
+                report['removed'] = Product.objects.filter(
+                    external_id__in=tombstones, is_available=True
+                ).update(is_available=False, last_synced=now)
+
+                if report['removed']:
+                    transaction.on_commit(bump_catalog_version)
+
+            if not incoming:
+                report['total'] = len(tombstones)
+                return report
+
+            categories = self._resolve_categories({row['category'] for row in incoming.values()})
+
+            existing = {}
+            external_ids = list(incoming)
+            for start in range(0, len(external_ids), self.batch_size):
+                chunk = external_ids[start:start + self.batch_size]
+                for product in Product.objects.using('default').filter(external_id__in=chunk):
+                    existing[product.external_id] = product
+
+            to_create = []
+            to_update = []
+            for external_id, row in incoming.items():
+                row['category'] = categories[row['category']]
+                product = existing.get(external_id)
+
+                if product is None:
+                    to_create.append(Product(external_id=external_id, last_synced=now, **self._row_fields(row)))
+                    continue
+
+                if self._has_changed(product, row):
+                    for field, value in self._row_fields(row).items():
+                        setattr(product, field, value)
+                    product.last_synced = now
+                    to_update.append(product)
+                else:
+                    report['unchanged'] += 1
+
+            if to_create:
+                Product.objects.bulk_create(to_create, batch_size=self.batch_size)
+            if to_update:
+                Product.objects.bulk_update(
+                    to_update, SYNCED_FIELDS + ['last_synced'], batch_size=self.batch_size
+                )
+            if to_create or to_update:
+                # Bulk writes skip model signals, so invalidate cached menus here
+                transaction.on_commit(bump_catalog_version)
+
+        report['created'] = len(to_create)
+        report['updated'] = len(to_update)
+        report['total'] = len(incoming) + len(tombstones)
+        logger.info(
+            f"Catalog sync: {report['created']} created, {report['updated']} updated, "
+            f"{report['unchanged']} unchanged, {report['removed']} removed, {report['skipped']} skipped"
+        )
+        return report
+
+    def _normalize(self, product_data):
+        """Convert a product service row into local field values."""
+        external_id = product_data.get('id')
+        if not external_id:
+            logger.error("Cannot sync product without external ID")
+            return None
+
+        category_data = product_data.get('category')
+        category_name = category_data.get('name') if isinstance(category_data, dict) else category_data
+        category_name = category_name or 'Uncategorized'
+
+        try:
+            price = Decimal(str(product_data.get('price', 0))).quantize(Decimal('0.01'))
+        except InvalidOperation:
+            logger.error(f"Cannot sync product {external_id}: invalid price")
+            return None
+
+        return {
+            'external_id': str(external_id),
+            'name': product_data.get('name', 'Unknown Product'),
+            'price': price,
+            'description': product_data.get('description') or '',
+            'category': category_name,
+            'image_url': product_data.get('image_url') or '',
+            'is_available': bool(product_data.get('is_available', True)),
+        }
+
+    def _has_changed(self, product, row):
+        """Compare a local product against a normalized incoming row."""
+        for field in SYNCED_FIELDS:
+            if field == 'category':
+                if product.category_id != row['category'].id:
+                    return True
+            elif getattr(product, field) != row[field]:
+                return True
+        return False
+
+    def _row_fields(self, row):
+        """Return the SYNCED_FIELDS subset of a normalized row."""
+        return {field: row[field] for field in SYNCED_FIELDS}
+
+    def _resolve_categories(self, names):
+        """Map category names to Category rows, creating missing ones in bulk."""
+        categories = {c.name: c for c in Category.objects.using('default').filter(name__in=names)}
+        missing = [Category(name=name) for name in names if name not in categories]
+        if missing:
+            Category.objects.bulk_create(missing, ignore_conflicts=True)
+            categories = {c.name: c for c in Category.objects.using('default').filter(name__in=names)}
+        return categories
+
@@ -0,0 +1,95 @@
+# orders/test_runner.py
+
+import logging
+import os
+import shutil
+import subprocess
+import tempfile
+
+from django.conf import settings
+from django.db import connections
+from django.test.runner import DiscoverRunner
+
+logger = logging.getLogger(__name__)
+
+
+class TemporaryPostgres:
+    """
+    A throwaway PostgreSQL cluster in a fresh directory under parent, listening
+    only on a unix socket there. Needs the PostgreSQL server binaries (initdb,
+    pg_ctl) on PATH or in PG_BIN, and a non-root user; no Docker.
+    """
+
+    def __init__(self, parent, port):
+        self.parent = str(parent)
+        self.port = port
+        self.directory = None
+        self.bin_dir = os.environ.get('PG_BIN', '')
+
+    def _command(self, name):
+        path = os.path.join(self.bin_dir, name) if self.bin_dir else shutil.which(name)
+        if not path:
+            raise RuntimeError(f"{name} not found; install PostgreSQL or set PG_BIN to its bin directory")
+        return path
+
+    @property
+    def data(self):
+        return os.path.join(self.directory, 'data')
+
+    def start(self):
+        """Start the cluster and return its directory, which is also the socket directory."""
+        # Only the directory created here is ever removed, never anything already under parent
+        os.makedirs(self.parent, exist_ok=True)
+        self.directory = tempfile.mkdtemp(prefix='cluster-', dir=self.parent)
+        try:
+            subprocess.run(
+                [self._command('initdb'), '-D', self.data, '-U', 'postgres', '-A', 'trust', '-E', 'UTF8', '--no-sync'],
+                check=True, stdout=subprocess.DEVNULL,
+            )
+            # Durability is pointless for a test cluster
+            server_options = f"-p {self.port} -k {self.directory} -c listen_addresses='' -c fsync=off -c synchronous_commit=off"
+            subprocess.run(
+                [self._command('pg_ctl'), '-D', self.data, '-l', os.path.join(self.directory, 'server.log'),
+                 '-o', server_options, '-w', 'start'],
+                check=True, stdout=subprocess.DEVNULL,
+            )
+        except Exception:
+            self.stop()
+            raise
+        logger.info(f"Temporary PostgreSQL started in {self.directory}")
+        return self.directory
+
+    def stop(self):
+        if self.directory is None:
+            return
+        try:
+            # Nothing to stop if initdb never got to create the cluster
+            if os.path.isdir(self.data):
+                subprocess.run(
+                    [self._command('pg_ctl'), '-D', self.data, '-m', 'immediate', '-w', 'stop'],
+                    check=False, stdout=subprocess.DEVNULL,
+                )
+        finally:
+            shutil.rmtree(self.directory, ignore_errors=True)
+            self.directory = None
+
+
+class OrdersTestRunner(DiscoverRunner):
+    """Test runner that starts a temporary PostgreSQL first when TEST_POSTGRES is set."""
+
+    def setup_databases(self, **kwargs):
+        self.postgres = None
+        if getattr(settings, 'TEST_POSTGRES', False):
+            database = settings.DATABASES['default']
+            self.postgres = TemporaryPostgres(database['HOST'], database['PORT'])
+            # Connect through the cluster's own socket directory
+            database['HOST'] = connections['default'].settings_dict['HOST'] = self.postgres.start()
+        return super().setup_databases(**kwargs)
+
+    def teardown_databases(self, old_config, **kwargs):
+        try:
+            super().teardown_databases(old_config, **kwargs)
+        finally:
+            if self.postgres is not None:
+                connections.close_all()
+                self.postgres.stop()
@@ -1,13 +1,48 @@
 # orders/tests.py
-from django.test import TestCase
+from django.test import RequestFactory, TestCase, TransactionTestCase
 from django.urls import reverse
 from django.utils import timezone
 from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import OperationalError, connection, transaction
+from django.http import HttpResponse
+from django.test import override_settings
+from django.utils.translation import gettext_lazy
 from rest_framework.test import APITestCase
 from rest_framework import status
+from rest_framework.exceptions import ParseError
+from rest_framework.renderers import JSONRenderer
+from unittest import skipUnless
 from unittest.mock import patch, MagicMock
-from .models import Category, Product, Order, OrderItem
+import base64
+import gzip
+import json
+import threading
+import time
+import uuid
+from decimal import Decimal
+from io import BytesIO, StringIO
+from .models import (
+    Category, Product, Order, OrderItem, OrderRollup, OutboxEvent, ProductRollup,
+    InvalidStatusTransition, StatusConflict,
+)
+from .availability import availability_index
+from .clients import CircuitBreaker, CircuitOpenError, ServiceClient
+from .health import DependencyProber, dependency_prober
+from .kitchen import KitchenFeed, kitchen_feed
+from .outbox import OutboxDispatcher
+from .parsers import OrJSONParser
+from .projections import OrderProjection, order_rows
+from .renderers import OrJSONRenderer, msgpack
+from .rollups import GRAINS, rebuild
+from .routing import (
+    PIN_COOKIE, ReadYourWritesMiddleware, ReplicaRouter, primary_reads, read_from_replica, replica_reads,
+)
+from .signals import publish_event
+from .views import OrderViewSet
 from .serializers import OrderSerializer, OrderItemSerializer
+from .sync import CatalogSyncEngine, SyncDeadlineExceeded, sync_lock
 
 User = get_user_model()
 
@@ -17,6 +52,10 @@ class OrderingServiceTestCase(APITestCase):
     
     def setUp(self):
         """Set up test data."""
+        # Start every test from an empty response cache and availability index
+        cache.clear()
+        availability_index.invalidate()
+        
         # Create test user
         self.user = User.objects.create_user(
             username='testuser',
@@ -167,6 +206,121 @@ class OrderModelTest(TestCase):
         self.order.update_status('PREPARING')
         self.assertEqual(self.order.status, 'PREPARING')
         self.assertIsNotNone(self.order.preparing_at)
+        
+        # Only the graph's transitions are allowed
+        with self.assertRaises(InvalidStatusTransition):
+            self.order.update_status('DELIVERED')
+        
+        # A stale instance loses to the writer that got there first
+        stale = Order.objects.get(pk=self.order.pk)
+        self.order.update_status('READY')
+        with self.assertRaises(StatusConflict):
+            stale.update_status('CANCELLED')
+        self.assertEqual(stale.status, 'READY')
+    
+    def test_total_kept_incrementally(self):
+        """Item inserts, quantity changes and deletes move the total by their subtotal."""
+        burger = OrderItem.objects.create(order=self.order, product=self.product1, quantity=2, unit_price='9.99')
+        fries = OrderItem.objects.create(order=self.order, product=self.product2, quantity=1, unit_price='4.99')
+        
+        # The unit_price snapshot counts, not the live product price
+        Product.objects.filter(pk=self.product1.pk).update(price='12.00')
+        burger.quantity = 3
+        with self.assertNumQueries(5):  # savepoint, lock, item update, one order UPDATE, release
+            burger.save(update_fields=['quantity'])
+        self.order.refresh_from_db()
+        self.assertEqual(self.order.total_price, Decimal('34.96'))
+        
+        fries.delete()
+        OrderItem.objects.filter(order=self.order).delete()
+        self.order.refresh_from_db()
+        self.assertEqual(self.order.total_price, Decimal('0.00'))
+    
+    def test_reconcile_order_totals(self):
+        """The reconciliation command reports and repairs drifted totals."""
+        OrderItem.objects.create(order=self.order, product=self.product1, quantity=2, unit_price='9.99')
+        Order.objects.filter(pk=self.order.pk).update(total_price='1.00')
+        
+        out = StringIO()
+        call_command('reconcile_order_totals', stdout=out)
+        self.assertIn('1 orders drifted', out.getvalue())
+        
+        call_command('reconcile_order_totals', '--fix', stdout=StringIO())
+        self.order.refresh_from_db()
+        self.assertEqual(self.order.total_price, Decimal('19.98'))
+
+
+class OrderTotalConcurrencyTest(TransactionTestCase):
+    """Concurrent item edits on one order must not lose each other's totals."""
+    
+    def test_concurrent_item_changes(self):
+        user = User.objects.create_user(username='hammer', password='testpass123')
+        order = Order.objects.create(user=user, customer_name='Hammer')
+        products = [
+            Product.objects.create(external_id=f'ext-c{i}', name=f'Dish {i}', price='2.50', is_available=True)
+            for i in range(8)
+        ]
+        
+        def worker(product):
+            try:
+                for quantity in (1, 3, 2):
+                    while True:
+                        try:
+                            with transaction.atomic():
+                                item = OrderItem.objects.filter(order=order, product=product).first()
+                                if item is None:
+                                    OrderItem.objects.create(order_id=order.pk, product=product, quantity=quantity)
+                                else:
+                                    item.quantity = quantity
+                                    item.save()
+                            break
+                        except OperationalError:
+                            # SQLite allows one writer at a time; PostgreSQL queues on the row locks
+                            time.sleep(0.01)
+            finally:
+                connection.close()
+        
+        threads = [threading.Thread(target=worker, args=(product,)) for product in products]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        
+        order.refresh_from_db()
+        self.assertEqual(order.total_price, Decimal('40.00'))  # 8 dishes x 2 x 2.50
+    
+    def test_concurrent_increments_of_one_item(self):
+        user = User.objects.create_user(username='hammer', password='testpass123')
+        order = Order.objects.create(user=user, customer_name='Hammer')
+        product = Product.objects.create(external_id='ext-c', name='Dish', price='2.50', is_available=True)
+        item = OrderItem.objects.create(order=order, product=product, quantity=1)
+        
+        def worker():
+            try:
+                for _ in range(5):
+                    while True:
+                        try:
+                            with transaction.atomic():
+                                # Read the quantity under the row lock, so no increment is lost
+                                locked = OrderItem.objects.select_for_update().get(pk=item.pk)
+                                locked.quantity += 1
+                                locked.save()
+                            break
+                        except OperationalError:
+                            time.sleep(0.01)
+            finally:
+                connection.close()
+        
+        threads = [threading.Thread(target=worker) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        
+        item.refresh_from_db()
+        order.refresh_from_db()
+        self.assertEqual(item.quantity, 41)  # 1 + 8 threads x 5
+        self.assertEqual(order.total_price, Decimal('102.50'))
 
 # =============== Serializer Tests ===============
 class OrderSerializerTest(TestCase):
@@ -227,6 +381,283 @@ class OrderSerializerTest(TestCase):
         self.assertEqual(order.user, self.user)
         self.assertEqual(order.customer_name, 'John Doe')
         self.assertEqual(order.items.count(), 2)
+    
+    def test_create_query_count_is_constant(self):
+        """Test that order creation cost does not grow with the cart size."""
+        products = [
+            Product.objects.create(external_id=f'bulk-{i}', name=f'Item {i}', price=2, category=self.category)
+            for i in range(10)
+        ]
+        
+        def create(cart):
+            serializer = OrderSerializer(data={
+                'user': self.user.id,
+                'items': [{'product': product.id, 'quantity': 1} for product in cart],
+            })
+            self.assertTrue(serializer.is_valid(), serializer.errors)
+            serializer.save()
+            return serializer.data
+        
+        with self.assertNumQueries(8) as small:
+            create(products[:2])
+        with self.assertNumQueries(len(small.captured_queries)):
+            data = create(products)
+        self.assertEqual(len(data['items']), 10)
+        self.assertEqual(data['total_price'], '20.00')
+    
+    def test_create_merges_duplicate_products(self):
+        """Test that repeated lines for one product become a single item."""
+        serializer = OrderSerializer(data={
+            'user': self.user.id,
+            'items': [
+                {'product': self.product1.id, 'quantity': 1, 'special_instructions': 'No onions'},
+                {'product': self.product2.id, 'quantity': 1},
+                {'product': self.product1.id, 'quantity': 2, 'special_instructions': 'Extra cheese'},
+            ]
+        })
+        self.assertTrue(serializer.is_valid(), serializer.errors)
+        order = serializer.save()
+        
+        item = order.items.get(product=self.product1)
+        self.assertEqual(item.quantity, 3)
+        self.assertEqual(item.special_instructions, 'No onions; Extra cheese')
+        self.assertEqual(str(order.total_price), '34.96')
+
+# =============== Catalog Sync Tests ===============
+class CatalogSyncEngineTest(TestCase):
+    """Test the set-based catalog sync engine."""
+    
+    def setUp(self):
+        """Set up an existing catalog."""
+        self.category = Category.objects.create(name='Main Course')
+        self.product = Product.objects.create(
+            external_id='1',
+            name='Burger',
+            price='9.99',
+            category=self.category,
+            is_available=True
+        )
+    
+    def test_apply_reports_changes(self):
+        """Test that only new and changed rows are written."""
+        products_data = [
+            {'id': 1, 'name': 'Burger', 'price': '9.99', 'category': 'Main Course'},
+            {'id': 2, 'name': 'Fries', 'price': '3.50', 'category': {'name': 'Sides'}},
+            {'id': 3, 'name': 'Soda', 'price': 2, 'category': 'Drinks', 'is_available': False},
+            {'name': 'No ID'},
+        ]
+        
+        report = CatalogSyncEngine().apply(products_data)
+        
+        self.assertEqual(report['created'], 2)
+        self.assertEqual(report['updated'], 0)
+        self.assertEqual(report['unchanged'], 1)
+        self.assertEqual(report['skipped'], 1)
+        self.assertEqual(Product.objects.get(external_id='2').category.name, 'Sides')
+        self.assertFalse(Product.objects.get(external_id='3').is_available)
+        
+        # A price change is picked up as an update
+        report = CatalogSyncEngine().apply([
+            {'id': 1, 'name': 'Burger', 'price': '10.49', 'category': 'Main Course'},
+        ])
+        self.assertEqual(report['updated'], 1)
+        self.product.refresh_from_db()
+        self.assertEqual(str(self.product.price), '10.49')
+    
+    def test_apply_query_count_is_constant(self):
+        """Test that sync cost does not grow with the number of products."""
+        products_data = [
+            {'id': i, 'name': f'Item {i}', 'price': '1.00', 'category': f'Cat {i % 3}'}
+            for i in range(100, 150)
+        ]
+        # categories lookup + insert + re-read, products lookup, bulk insert, savepoint
+        with self.assertNumQueries(7):
+            CatalogSyncEngine().apply(products_data)
+    
+    @patch('requests.Session.request')
+    def test_run_follows_pages(self, mock_get):
+        """Test that the catalog is fetched page by page."""
+        first_page = MagicMock(status_code=200)
+        first_page.json.return_value = {
+            'results': [{'id': 10, 'name': 'Tea', 'price': '1.50', 'category': 'Drinks'}],
+            'next': 'http://products/api/products/?limit=1&offset=1',
+        }
+        second_page = MagicMock(status_code=200)
+        second_page.json.return_value = {
+            'results': [{'id': 11, 'name': 'Coffee', 'price': '2.00', 'category': 'Drinks'}],
+            'next': None,
+        }
+        mock_get.side_effect = [first_page, second_page]
+        
+        report = CatalogSyncEngine(page_size=1).run()
+        
+        self.assertEqual(mock_get.call_count, 2)
+        self.assertEqual(report['created'], 2)
+    
+    @patch('requests.Session.request')
+    def test_delta_sync_applies_tombstones(self, mock_get):
+        """Test that a delta sync sends the sync point and handles deletions."""
+        page = MagicMock(status_code=200)
+        page.json.return_value = {
+            'results': [{'id': 2, 'name': 'Fries', 'price': '3.50', 'category': 'Sides'}],
+            'deleted': ['1'],
+            'next': None,
+        }
+        mock_get.return_value = page
+        
+        report = CatalogSyncEngine().run_delta()
+        
+        self.assertEqual(report['mode'], 'delta')
+        self.assertIn('since', mock_get.call_args.kwargs['params'])
+        self.assertEqual(report['created'], 1)
+        self.assertEqual(report['removed'], 1)
+        self.product.refresh_from_db()
+        self.assertFalse(self.product.is_available)
+    
+    @patch('requests.Session.request')
+    def test_run_stops_at_deadline(self, mock_get):
+        """Test that a sync past its deadline raises before writing anything."""
+        page = MagicMock(status_code=200)
+        page.json.return_value = {
+            'results': [{'id': 2, 'name': 'Fries', 'price': '3.50', 'category': 'Sides'}],
+            'next': None,
+        }
+        mock_get.return_value = page
+        
+        with self.assertRaises(SyncDeadlineExceeded):
+            CatalogSyncEngine().run(deadline=time.monotonic())
+        self.assertFalse(Product.objects.filter(external_id='2').exists())
+    
+    @patch.object(CatalogSyncEngine, 'run_delta', side_effect=OperationalError('database is locked'))
+    def test_sync_command_survives_unexpected_errors(self, mock_run_delta):
+        """Test that an unexpected error is logged instead of ending the sync worker."""
+        with self.assertLogs('orders.management.commands.sync_catalog', level='ERROR'):
+            call_command('sync_catalog', '--once', stdout=StringIO())
+        mock_run_delta.assert_called_once()
+    
+    def test_sync_lock_is_exclusive(self):
+        """Test that only one sync can hold the lock at a time."""
+        with sync_lock() as first:
+            with sync_lock() as second:
+                self.assertTrue(first)
+                self.assertFalse(second)
+        with sync_lock() as third:
+            self.assertTrue(third)
+
+# =============== Event Outbox Tests ===============
+@override_settings(EVENT_SERVICE_URL='http://events.local/events/')
+class OutboxTest(TestCase):
+    """Test the transactional outbox and its dispatcher."""
+    
+    def setUp(self):
+        # Circuit breaker state lives in the cache
+        cache.clear()
+    
+    @patch('requests.Session.request')
+    def test_publish_event_writes_outbox(self, mock_post):
+        """Test that publishing only records the event."""
+        publish_event('order.created', {'order_id': 'a', 'status': 'PENDING'})
+        
+        mock_post.assert_not_called()
+        event = OutboxEvent.objects.get()
+        self.assertEqual(event.aggregate_id, 'a')
+        self.assertIsNone(event.dispatched_at)
+    
+    @patch('requests.Session.request')
+    def test_dispatch_keeps_order_per_aggregate(self, mock_post):
+        """Test that a failing event holds back later events for the same order only."""
+        publish_event('order.created', {'order_id': 'a'})
+        publish_event('order.created', {'order_id': 'b'})
+        publish_event('order.updated', {'order_id': 'a'})
+        
+        def post(method, url, json=None, **kwargs):
+            return MagicMock(status_code=500 if json['data']['order_id'] == 'a' else 200)
+        mock_post.side_effect = post
+        
+        self.assertEqual(OutboxDispatcher().dispatch_batch(), 2)
+        
+        first, other, second = OutboxEvent.objects.order_by('id')
+        self.assertEqual(first.attempts, 1)
+        self.assertGreater(first.next_attempt_at, timezone.now())
+        self.assertIsNotNone(other.dispatched_at)
+        self.assertIsNone(second.dispatched_at)
+        self.assertEqual(second.attempts, 0)
+        
+        # While the first event backs off, the second stays queued behind it
+        mock_post.side_effect = None
+        mock_post.return_value = MagicMock(status_code=200)
+        self.assertEqual(OutboxDispatcher().dispatch_batch(), 0)
+        
+        OutboxEvent.objects.filter(id=first.id).update(next_attempt_at=timezone.now())
+        # Past its deadline (the lock's time budget) a batch stops sending
+        self.assertEqual(OutboxDispatcher().dispatch_batch(deadline=time.monotonic()), 0)
+        self.assertEqual(OutboxDispatcher().dispatch_batch(), 2)
+        self.assertFalse(OutboxEvent.objects.filter(dispatched_at__isnull=True).exists())
+    
+    def test_order_events_coalesce_per_transaction(self):
+        """Test that one transaction produces one event per order with the final state."""
+        user = User.objects.create_user(username='eventuser', password='eventpassword')
+        category = Category.objects.create(name='Main Course')
+        burger = Product.objects.create(external_id='ext-1', name='Burger', price='9.99', category=category)
+        fries = Product.objects.create(external_id='ext-2', name='Fries', price='4.99', category=category)
+        
+        with self.captureOnCommitCallbacks(execute=True):
+            with transaction.atomic():
+                order = Order.objects.create(user=user, customer_name='Test Customer')
+                OrderItem.objects.create(order=order, product=burger, quantity=2, unit_price=burger.price)
+                OrderItem.objects.create(order=order, product=fries, quantity=1, unit_price=fries.price)
+        
+        event = OutboxEvent.objects.get()
+        self.assertEqual(event.event_type, 'order.created')
+        self.assertEqual(event.payload['item_count'], 2)
+        self.assertEqual(event.payload['total_price'], 24.97)
+        self.assertLessEqual(event.next_attempt_at, timezone.now())
+    
+    def test_rolled_back_order_emits_nothing(self):
+        """Test that rolled-back work leaves no event and does not leak into the next transaction."""
+        with self.captureOnCommitCallbacks(execute=True):
+            try:
+                with transaction.atomic():
+                    Order.objects.create(customer_name='Rolled Back')
+                    raise RuntimeError
+            except RuntimeError:
+                pass
+            
+            with transaction.atomic():
+                order = Order.objects.create(customer_name='Committed')
+        
+        event = OutboxEvent.objects.get()
+        self.assertEqual(event.aggregate_id, str(order.id))
+        self.assertEqual(event.payload['items'], [])
+    
+    def test_savepoint_rollback_keeps_order_event(self):
+        """Test that an order whose held event was rolled back with a savepoint still gets one."""
+        # Inserted without signals, so the transaction below is the first to touch them
+        first, second = Order.objects.bulk_create([
+            Order(customer_name='First'), Order(customer_name='Second'),
+        ])
+        
+        with self.captureOnCommitCallbacks(execute=True):
+            with transaction.atomic():
+                first.status = 'CONFIRMED'
+                first.save()
+                try:
+                    with transaction.atomic():
+                        # Holds the event row for the second order, then rolls it back
+                        second.status = 'CANCELLED'
+                        second.save()
+                        raise RuntimeError
+                except RuntimeError:
+                    pass
+                second.refresh_from_db()
+                second.status = 'CONFIRMED'
+                second.save()
+        
+        events = {event.aggregate_id: event for event in OutboxEvent.objects.all()}
+        self.assertEqual(set(events), {str(first.id), str(second.id)})
+        self.assertEqual(events[str(second.id)].event_type, 'order.updated')
+        self.assertEqual(events[str(second.id)].payload['status'], 'CONFIRMED')
+        self.assertLessEqual(events[str(second.id)].next_attempt_at, timezone.now())
 
 # =============== API View Tests ===============
 class ProductViewSetTest(OrderingServiceTestCase):
@@ -245,11 +676,54 @@ class ProductViewSetTest(OrderingServiceTestCase):
         response = self.client.get(url, {'category': 'Main Course'})
         self.assertEqual(response.status_code, status.HTTP_200_OK)
         self.assertEqual(len(response.data), 2)
+    
+    def test_list_products_is_cached(self):
+        """Test that repeated listings are served from the cache regardless of parameter order."""
+        url = reverse('product-list')
+        self.client.get(url, {'category': 'Main Course', 'ordering': 'price'})
+        
+        with self.assertNumQueries(0):
+            response = self.client.get(f"{url}?ordering=price&category=main+course&utm=ad")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+    
+    def test_product_change_invalidates_list_cache(self):
+        """Test that editing a product bumps the catalog version."""
+        url = reverse('product-list')
+        self.client.get(url)
+        
+        with self.captureOnCommitCallbacks(execute=True):
+            self.product1.name = 'Cheeseburger'
+            self.product1.save()
+        
+        response = self.client.get(url)
+        names = [product['name'] for product in response.data['results']]
+        self.assertIn('Cheeseburger', names)
+    
+    def test_by_category_etag(self):
+        """Test that the menu snapshot answers If-None-Match with 304."""
+        url = reverse('product-by-category')
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.data['Main Course']), 2)
+        self.assertEqual(len(response.data['Dessert']), 1)
+        etag = response['ETag']
+        
+        with self.assertNumQueries(0):
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+        
+        with self.captureOnCommitCallbacks(execute=True):
+            self.product3.is_available = False
+            self.product3.save()
+        
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['Dessert'], [])
 
 class OrderViewSetTest(OrderingServiceTestCase):
     """Test the OrderViewSet."""
     
-    @patch('requests.get')
+    @patch('requests.Session.request')
     def test_create_order(self, mock_get):
         """Test creating an order."""
         # Mock the product service response
@@ -285,12 +759,651 @@ class OrderViewSetTest(OrderingServiceTestCase):
         order = Order.objects.get(id=order_id)
         self.assertEqual(order.customer_name, 'New Customer')
         self.assertEqual(order.items.count(), 2)
+    
+    @patch('requests.Session.request')
+    def test_batch_replay_reports_duplicates(self, mock_get):
+        """Test replaying a batch with the same client_refs creates nothing twice."""
+        url = reverse('order-batch')
+        data = {'orders': [
+            {'client_ref': 'pos-1', 'items': [{'product': self.product1.id, 'quantity': 1}]},
+            {'client_ref': 'pos-1', 'items': [{'product': self.product1.id, 'quantity': 1}]},
+        ]}
+        
+        response = self.client.post(url, data, format='json')
+        first, repeated = response.data['results']
+        self.assertEqual((first['status'], repeated['status']), ('created', 'duplicate'))
+        self.assertEqual(repeated['id'], first['id'])
+        
+        count = Order.objects.count()
+        response = self.client.post(url, data, format='json')
+        self.assertEqual(response.data['created'], 0)
+        self.assertEqual(response.data['duplicates'], 2)
+        self.assertEqual({result['id'] for result in response.data['results']}, {first['id']})
+        self.assertEqual(Order.objects.count(), count)
+    
+    @patch('requests.Session.request')
+    def test_create_order_initial_status(self, mock_get):
+        """Test new orders can only start as PENDING or CONFIRMED, with the matching timestamp."""
+        mock_get.return_value = MagicMock(status_code=200, json=MagicMock(return_value={
+            str(self.product1.id): {'available': True},
+        }))
+        items = [{'product': self.product1.id, 'quantity': 1}]
+        
+        response = self.client.post(reverse('order-list'), {'status': 'DELIVERED', 'items': items}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('status', response.data)
+        
+        response = self.client.post(reverse('order-batch'), {'orders': [
+            {'status': 'CANCELLED', 'items': items},
+            {'status': 'CONFIRMED', 'items': items},
+        ]}, format='json')
+        self.assertEqual([r['status'] for r in response.data['results']], ['rejected', 'created'])
+        self.assertIsNotNone(Order.objects.get(id=response.data['results'][1]['id']).confirmed_at)
+        
+        response = self.client.post(reverse('order-list'), {'status': 'CONFIRMED', 'items': items}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertIsNotNone(response.data['confirmed_at'])
+    
+    @patch('requests.Session.request')
+    def test_batch_create_orders(self, mock_get):
+        """Test submitting several orders in one request."""
+        self.product2.is_available = False
+        self.product2.save()
+        
+        url = reverse('order-batch')
+        data = {'orders': [
+            {'client_ref': 'pos-1', 'table_number': 1, 'items': [{'product': self.product1.id, 'quantity': 2}]},
+            {'client_ref': 'pos-2', 'items': [{'product': self.product2.id, 'quantity': 1}]},
+            {'client_ref': 'pos-3', 'items': []},
+            {'client_ref': 'pos-4', 'items': [
+                {'product': self.product1.id, 'quantity': 1},
+                {'product': self.product3.id, 'quantity': 3},
+            ]},
+        ]}
+        
+        response = self.client.post(url, data, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        mock_get.assert_not_called()
+        self.assertEqual(response.data['created'], 2)
+        self.assertEqual(response.data['rejected'], 2)
+        
+        statuses = [(r['client_ref'], r['status']) for r in response.data['results']]
+        self.assertEqual(statuses, [
+            ('pos-1', 'created'), ('pos-2', 'rejected'), ('pos-3', 'rejected'), ('pos-4', 'created'),
+        ])
+        
+        order = Order.objects.get(id=response.data['results'][3]['id'])
+        self.assertEqual(order.user, self.user)
+        self.assertEqual(order.items.count(), 2)
+        self.assertEqual(str(order.total_price), '27.96')
+    
+    @patch('requests.Session.request')
+    def test_create_order_validates_locally(self, mock_get):
+        """Test that synced products are validated without calling the catalog service."""
+        self.product2.is_available = False
+        self.product2.save()
+        availability_index.invalidate()
+        
+        url = reverse('order-list')
+        response = self.client.post(url, {
+            'items': [{'product': self.product2.id, 'quantity': 1}]
+        }, format='json')
+        
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(response.data['detail'], f"Product {self.product2.id} is unavailable")
+        mock_get.assert_not_called()
+    
+    @override_settings(PRODUCT_AVAILABILITY_DEGRADED_POLICY='reject')
+    @patch('requests.Session.request')
+    def test_unknown_product_rejected_when_catalog_down(self, mock_get):
+        """Test the degraded-mode policy for products the local index doesn't know."""
+        from requests.exceptions import ConnectionError
+        mock_get.side_effect = ConnectionError("down")
+        
+        unavailable = OrderViewSet().find_unavailable_products([self.product1.id, 999999])
+        
+        self.assertEqual(unavailable, {'999999'})
+    
+    def test_update_status_conditional(self):
+        """Status changes are one conditional UPDATE; illegal ones are 400s and lost races 409s."""
+        self.authenticate_staff()
+        url = reverse('order-update-status', args=[self.order.id])
+        
+        response = self.client.patch(url, {'status': 'CONFIRMED'}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.order.refresh_from_db()
+        self.assertEqual(self.order.status, 'CONFIRMED')
+        self.assertIsNotNone(self.order.confirmed_at)
+        
+        response = self.client.patch(url, {'status': 'DELIVERED'}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        
+        # Another writer moves the order between our read and our UPDATE
+        original = Order.update_status
+        
+        def race(order, new_status):
+            Order.objects.filter(pk=order.pk).update(status='CANCELLED')
+            return original(order, new_status)
+        
+        with patch.object(Order, 'update_status', race):
+            response = self.client.patch(url, {'status': 'PREPARING'}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_409_CONFLICT)
+        self.assertEqual(response.data['status'], 'CANCELLED')
+    
+    def test_projection_matches_serializer(self):
+        """The values() projection renders exactly what OrderSerializer does, in two queries."""
+        self.order.update_status('CONFIRMED')
+        self.order.update_status('PREPARING')
+        Order.objects.create(user=self.user, customer_name='Empty')
+        orders = Order.objects.order_by('-created_at', '-id')
+        
+        expected = OrderSerializer(orders.prefetch_related('items__product__category'), many=True).data
+        with self.assertNumQueries(2):
+            payloads = OrderProjection().represent(order_rows(orders))
+        self.assertEqual(json.loads(json.dumps(payloads)), json.loads(json.dumps(expected)))
+        
+        response = self.client.get(reverse('order-active'))
+        self.assertEqual([order['id'] for order in response.data], [str(order.id) for order in orders])
+    
+    def test_list_uses_keyset_cursor(self):
+        """Test order pages follow a (created_at, id) cursor without repeats, even as orders arrive."""
+        for i in range(11):
+            Order.objects.create(user=self.user, customer_name=f'Customer {i}')
+        url = reverse('order-list')
+        
+        response = self.client.get(url, {'page_size': 5})
+        self.assertNotIn('count', response.data)
+        seen = [order['id'] for order in response.data['results']]
+        Order.objects.create(user=self.user, customer_name='Arrived while paging')
+        
+        while response.data['next']:
+            response = self.client.get(response.data['next'])
+            seen.extend(order['id'] for order in response.data['results'])
+        
+        self.assertEqual(len(seen), 12)
+        self.assertEqual(len(set(seen)), 12)
+        
+        response = self.client.get(url, {'include_total': 1})
+        self.assertEqual(response.data['count'], 13)
+        self.assertEqual(self.client.get(url, {'cursor': 'garbage'}).status_code, 404)
+    
+    def test_list_rejects_malformed_cursor_id(self):
+        """Test a cursor with a valid timestamp but a malformed order id is a 404, not a 500."""
+        url = reverse('order-list')
+        cursor = base64.urlsafe_b64encode(b'2024-01-01T00:00:00+00:00|zzz').decode().rstrip('=')
+        self.assertEqual(self.client.get(url, {'cursor': cursor}).status_code, 404)
+    
+    def test_stats_single_query_and_cached(self):
+        """Test order statistics are one aggregate query, then served from cache."""
+        self.authenticate_staff()
+        now = timezone.now()
+        delivered = Order.objects.create(status='DELIVERED', total_price='20.00')
+        Order.objects.filter(id=delivered.id).update(
+            confirmed_at=now - timezone.timedelta(minutes=20),
+            ready_at=now - timezone.timedelta(minutes=5)
+        )
+        old = Order.objects.create(status='DELIVERED', total_price='99.00')
+        Order.objects.filter(id=old.id).update(created_at=now - timezone.timedelta(days=3))
+        
+        url = reverse('order-stats')
+        with self.assertNumQueries(1):
+            response = self.client.get(url)
+        
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['today_orders'], 2)
+        self.assertEqual(float(response.data['today_revenue']), 20.0)
+        self.assertEqual(response.data['pending_orders'], 1)
+        self.assertEqual(response.data['avg_preparation_time'], 15.0)
+        
+        with self.assertNumQueries(0):
+            self.client.get(url)
+
+# =============== Kitchen Stream Tests ===============
+class KitchenFeedTest(OrderingServiceTestCase):
+    """Test the kitchen board change feed and its SSE stream."""
+    
+    def test_poll_sends_only_changes(self):
+        """Test the feed sends a delta per changed order and nothing when unchanged."""
+        self.order.status = 'CONFIRMED'
+        self.order.save()
+        feed = KitchenFeed()
+        feed.load_board()
+        self.assertIn(str(self.order.id), feed.board)
+        self.assertEqual(feed.poll(), [])
+        
+        self.order_item1.is_prepared = True
+        self.order_item1.save()
+        events = feed.poll()
+        self.assertEqual(len(events), 1)
+        self.assertEqual(events[0][0], 'upsert')
+        self.assertTrue(next(item for item in events[0][1]['items'] if item['id'] == self.order_item1.id)['is_prepared'])
+        
+        self.order.status = 'READY'
+        self.order.save()
+        self.assertEqual(feed.poll(), [('remove', {'id': str(self.order.id)})])
+    
+    def test_kitchen_view_since_cursor(self):
+        """Test kitchen_view returns only changes since the cursor, from one query."""
+        self.authenticate_staff()
+        self.order.status = 'CONFIRMED'
+        self.order.save()
+        url = reverse('order-kitchen-view')
+        
+        response = self.client.get(url)
+        self.assertEqual([order['id'] for order in response.data], [str(self.order.id)])
+        self.assertEqual(response.data[0]['items'][0]['category'], 'Main Course')
+        cursor = response['X-Kitchen-Cursor']
+        
+        with self.assertNumQueries(2), override_settings(KITCHEN_STREAM_OVERLAP=0):
+            response = self.client.get(url, {'since': cursor})
+        self.assertEqual(response.data['orders'], [])
+        self.assertEqual(response.data['removed'], [])
+        
+        # Within the overlap window the order is sent again
+        response = self.client.get(url, {'since': cursor})
+        self.assertEqual([order['id'] for order in response.data['orders']], [str(self.order.id)])
+        
+        self.order_item1.is_prepared = True
+        self.order_item1.save()
+        response = self.client.get(url, {'since': cursor})
+        self.assertEqual([order['id'] for order in response.data['orders']], [str(self.order.id)])
+        
+        self.order.status = 'READY'
+        self.order.save()
+        response = self.client.get(url, {'since': response.data['cursor']})
+        self.assertEqual(response.data['orders'], [])
+        self.assertEqual(response.data['removed'], [str(self.order.id)])
+        
+        # Deleted orders are reported through their tombstones
+        cursor = response.data['cursor']
+        order_id = str(self.order.id)
+        self.order.delete()
+        response = self.client.get(url, {'since': cursor})
+        self.assertEqual(response.data['removed'], [order_id])
+        
+        self.assertEqual(self.client.get(url, {'since': 'yesterday'}).status_code, 400)
+        self.assertEqual(self.client.get(url, {'since': '2020-01-01T00:00:00Z'}).status_code, 410)
+    
+    def test_stream_needs_asgi(self):
+        """Test the stream refuses WSGI requests instead of buffering an endless response."""
+        self.client.force_login(self.staff_user)
+        response = self.client.get(reverse('kitchen-stream'))
+        self.assertEqual(response.status_code, 501)
+        self.assertIn('ordering.asgi', response.json()['detail'])
+    
+    async def test_stream_sends_snapshot(self):
+        """Test the stream starts with the board snapshot and is staff only."""
+        await Order.objects.filter(id=self.order.id).aupdate(status='PREPARING')
+        url = reverse('kitchen-stream')
+        
+        await self.async_client.aforce_login(self.user)
+        response = await self.async_client.get(url)
+        self.assertEqual(response.status_code, 403)
+        
+        await self.async_client.aforce_login(self.staff_user)
+        response = await self.async_client.get(url)
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+        content = response.streaming_content
+        try:
+            self.assertEqual(await anext(content), b"retry: 3000\n\n")
+            event, data = (await anext(content)).decode().strip().split("\n")
+            self.assertEqual(event, "event: snapshot")
+            self.assertEqual([order['id'] for order in json.loads(data[len("data: "):])], [str(self.order.id)])
+        finally:
+            await content.aclose()
+            await kitchen_feed.stop()
+
+# =============== Rollup Tests ===============
+class SalesRollupTest(OrderingServiceTestCase):
+    """Test the incrementally maintained sales rollups."""
+    
+    def deliver(self, order):
+        now = timezone.now()
+        order.confirmed_at = now - timezone.timedelta(minutes=30)
+        order.ready_at = now - timezone.timedelta(minutes=10)
+        order.status = 'DELIVERED'
+        order.save()
+    
+    def test_delivered_order_is_rolled_up_once(self):
+        """Test delivering an order updates every grain, and later saves don't count it again."""
+        self.deliver(self.order)
+        self.order.special_requests = 'Extra napkins'
+        self.order.save()
+        
+        for grain in GRAINS:
+            rollup = OrderRollup.objects.get(grain=grain)
+            self.assertEqual(rollup.delivered_orders, 1)
+            self.assertEqual(rollup.revenue, self.order.total_price)
+            self.assertEqual(rollup.prep_count, 1)
+            self.assertEqual(ProductRollup.objects.get(grain=grain, product=self.product1).quantity, 2)
+    
+    def test_rebuild_matches_incremental(self):
+        """Test a rebuild from the order tables reproduces the incremental rollups."""
+        self.deliver(self.order)
+        cancelled = Order.objects.create(user=self.user, status='PENDING')
+        OrderItem.objects.create(order=cancelled, product=self.product2, quantity=3, unit_price=self.product2.price)
+        cancelled.status = 'CANCELLED'
+        cancelled.save()
+        
+        def snapshot():
+            return (
+                list(OrderRollup.objects.values_list('grain', 'bucket', 'delivered_orders', 'cancelled_orders', 'revenue', 'prep_count')),
+                list(ProductRollup.objects.values_list('grain', 'bucket', 'product_id', 'quantity', 'revenue', 'cancelled_quantity')),
+            )
+        
+        incremental = snapshot()
+        self.assertEqual(rebuild(), 2)
+        self.assertEqual(snapshot(), incremental)
+        self.assertEqual(ProductRollup.objects.get(grain='day', product=self.product2).cancelled_quantity, 3)
+    
+    def test_order_created_final_is_rolled_up_on_commit(self):
+        """Test an order created DELIVERED is rolled up with its items and total once committed."""
+        with self.captureOnCommitCallbacks(execute=True):
+            order = Order.objects.create(user=self.user, status='DELIVERED')
+            OrderItem.objects.create(order=order, product=self.product3, quantity=1, unit_price=Decimal('5.00'))
+        
+        rollup = OrderRollup.objects.get(grain='day')
+        self.assertEqual(rollup.delivered_orders, 1)
+        self.assertEqual(rollup.revenue, Decimal('5.00'))
+        self.assertEqual(ProductRollup.objects.get(grain='day', product=self.product3).quantity, 1)
+    
+    def test_batch_and_delete_keep_rollups_in_step(self):
+        """Test bulk-created final orders are rolled up and deleted orders are taken back out."""
+        orders = OrderSerializer(many=True).create([
+            {'user': self.user, 'status': 'CANCELLED', 'items': [{'product': self.product2, 'quantity': 2}]},
+        ])
+        self.deliver(self.order)
+        
+        rollup = OrderRollup.objects.get(grain='day')
+        self.assertEqual((rollup.delivered_orders, rollup.cancelled_orders), (1, 1))
+        self.assertEqual(ProductRollup.objects.get(grain='day', product=self.product2).cancelled_quantity, 2)
+        
+        Order.objects.filter(pk=orders[0].pk).delete()
+        Order.objects.get(pk=self.order.pk).delete()
+        
+        rollup.refresh_from_db()
+        self.assertEqual((rollup.delivered_orders, rollup.cancelled_orders, rollup.revenue), (0, 0, 0))
+        self.assertFalse(ProductRollup.objects.exclude(quantity=0, revenue=0, cancelled_quantity=0).exists())
+    
+    def test_report_endpoints(self):
+        """Test the report endpoints read the rollups for a date range."""
+        self.deliver(self.order)
+        self.authenticate_staff()
+        today = timezone.localdate().isoformat()
+        
+        response = self.client.get(reverse('report-sales'), {'grain': 'hour', 'start': today, 'end': today})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data['buckets']), 1)
+        self.assertEqual(response.data['buckets'][0]['avg_preparation_time'], 20.0)
+        
+        response = self.client.get(reverse('report-categories'))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            {row['name']: row['quantity'] for row in response.data['categories']},
+            {'Main Course': 2, 'Dessert': 1}
+        )
+        
+        response = self.client.get(reverse('report-products'), {'start': today, 'end': '2000-01-01'})
+        self.assertEqual(response.status_code, 400)
+
+# =============== Replica Routing Tests ===============
+class ReplicaRouterTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.router = ReplicaRouter()
+        self.router.replicas = ['replica_1']
+        self.user = User.objects.create_user(username='diner', password='testpass123')
+        self.factory = RequestFactory()
+    
+    def route(self, request, view):
+        """Run view through the middleware; returns (response, view result)."""
+        result = {}
+        
+        def get_response(request):
+            result['value'] = view()
+            return HttpResponse()
+        
+        response = ReadYourWritesMiddleware(get_response)(request)
+        return response, result['value']
+    
+    def test_catalog_reads_use_replica(self):
+        """Catalog reads go to a replica; order reads only inside replica_reads()."""
+        def view():
+            with replica_reads():
+                history = self.router.db_for_read(Order)
+            return self.router.db_for_read(Product), self.router.db_for_read(Order), history
+        
+        _, routed = self.route(self.factory.get('/api/products/'), view)
+        self.assertEqual(routed, ('replica_1', None, 'replica_1'))
+        # Outside a request (workers, commands) everything stays on the primary
+        self.assertIsNone(self.router.db_for_read(Product))
+    
+    def test_write_pins_reads_to_primary(self):
+        """After a write, the same request and the user's next requests read the primary."""
+        request = self.factory.post('/api/orders/')
+        request.user = self.user
+        
+        def view():
+            self.assertEqual(self.router.db_for_write(Order), 'default')
+            return self.router.db_for_read(Product)
+        
+        response, routed = self.route(request, view)
+        self.assertIsNone(routed)
+        self.assertIn(PIN_COOKIE, response.cookies)
+        
+        # Pinned by the cookie
+        request = self.factory.get('/api/orders/history/')
+        request.COOKIES[PIN_COOKIE] = '1'
+        _, routed = self.route(request, lambda: self.router.db_for_read(Product))
+        self.assertIsNone(routed)
+        
+        # Pinned by user without the cookie (token clients)
+        request = self.factory.get('/api/orders/history/')
+        request.user = self.user
+        _, routed = self.route(request, lambda: self.router.db_for_read(Product))
+        self.assertIsNone(routed)
+        
+        cache.clear()
+        _, routed = self.route(request, lambda: self.router.db_for_read(Product))
+        self.assertEqual(routed, 'replica_1')
+    
+    def test_write_paths_read_primary(self):
+        """Unsafe requests, transactions and cache builds never read the catalog from a replica."""
+        _, routed = self.route(self.factory.post('/api/orders/'), lambda: self.router.db_for_read(Product))
+        self.assertIsNone(routed)
+        
+        def view():
+            with transaction.atomic():
+                in_transaction = self.router.db_for_read(Product)
+            with primary_reads():
+                building = self.router.db_for_read(Category)
+            return in_transaction, building, read_from_replica()
+        
+        _, routed = self.route(self.factory.get('/api/products/'), view)
+        self.assertEqual(routed, (None, None, False))
+    
+    def test_migrations_only_on_primary(self):
+        self.assertTrue(self.router.allow_migrate('default', 'orders'))
+        self.assertFalse(self.router.allow_migrate('replica_1', 'orders'))
+
+
+# =============== Renderer Tests ===============
+class RendererTest(OrderingServiceTestCase):
+    def test_orjson_matches_json_renderer(self):
+        """OrJSONRenderer output equals DRF's JSONRenderer, and the parser reads it back."""
+        data = {
+            'id': uuid.uuid4(),
+            'total': Decimal('12.50'),
+            'at': timezone.now(),
+            'label': gettext_lazy('Pending'),
+            'orders': OrderSerializer(Order.objects.all(), many=True).data,
+            7: 'int key',
+        }
+        rendered = OrJSONRenderer().render(data)
+        self.assertEqual(json.loads(rendered), json.loads(JSONRenderer().render(data)))
+        self.assertEqual(OrJSONParser().parse(BytesIO(rendered)), json.loads(rendered))
+        
+        with self.assertRaises(ParseError):
+            OrJSONParser().parse(BytesIO(b'{"items": ['))
+    
+    @skipUnless(msgpack, "msgpack is not installed")
+    def test_msgpack_negotiation(self):
+        """Clients that accept MessagePack get the same order list in it."""
+        url = reverse('order-list')
+        response = self.client.get(url, HTTP_ACCEPT='application/msgpack')
+        self.assertEqual(response['Content-Type'], 'application/msgpack')
+        self.assertEqual(msgpack.unpackb(response.content), self.client.get(url).json())
+
+
+# =============== Conditional GET and Compression Tests ===============
+@override_settings(CATALOG_ETAGS=True)
+class ConditionalGetTest(OrderingServiceTestCase):
+    def test_catalog_etag_not_modified(self):
+        """Catalog ETags come from the catalog version, so a 304 needs no queries."""
+        url = reverse('product-list')
+        response = self.client.get(url, {'category': 'Dessert'})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        etag = response['ETag']
+        self.assertTrue(etag.startswith('W/"catalog-'))
+        self.assertIn('no-cache', response['Cache-Control'])
+        
+        with self.assertNumQueries(0):
+            response = self.client.get(url, {'category': 'Dessert'}, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(response['ETag'], etag)
+        
+        # Another query is another representation
+        response = self.client.get(url, {'category': 'Main Course'}, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        
+        with self.captureOnCommitCallbacks(execute=True):
+            self.product3.name = 'Apple Pie'
+            self.product3.save()
+        
+        response = self.client.get(url, {'category': 'Dessert'}, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(response['ETag'], etag)
+    
+    def test_catalog_etags_need_shared_cache(self):
+        """Without CATALOG_ETAGS (per-process cache) the middleware stays out of the way."""
+        with override_settings(CATALOG_ETAGS=False):
+            self.client = self.client_class()
+            response = self.client.get(reverse('category-list'))
+        self.assertFalse(response.has_header('ETag'))
+    
+    def test_compression_threshold(self):
+        """JSON above RESPONSE_COMPRESSION_MIN_SIZE is gzipped for clients that accept it."""
+        url = reverse('product-list')
+        with override_settings(RESPONSE_COMPRESSION_MIN_SIZE=100):
+            response = self.client.get(url, HTTP_ACCEPT_ENCODING='gzip, br;q=0')
+            self.assertEqual(response['Content-Encoding'], 'gzip')
+            self.assertIn('Accept-Encoding', response['Vary'])
+            self.assertEqual(json.loads(gzip.decompress(response.content)), self.client.get(url).json())
+            
+            response = self.client.get(url, HTTP_ACCEPT_ENCODING='identity')
+            self.assertFalse(response.has_header('Content-Encoding'))
+            
+            # The browsable API page carries the CSRF token, so it is never compressed
+            response = self.client.get(url, HTTP_ACCEPT='text/html', HTTP_ACCEPT_ENCODING='gzip')
+            self.assertFalse(response.has_header('Content-Encoding'))
+            
+            # The by_category ETag is weakened when compressed and still matches
+            url = reverse('product-by-category')
+            response = self.client.get(url, HTTP_ACCEPT_ENCODING='gzip')
+            self.assertTrue(response['ETag'].startswith('W/'))
+            response = self.client.get(url, HTTP_ACCEPT_ENCODING='gzip', HTTP_IF_NONE_MATCH=response['ETag'])
+            self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+        
+        with override_settings(RESPONSE_COMPRESSION_MIN_SIZE=1_000_000):
+            response = self.client.get(url, HTTP_ACCEPT_ENCODING='gzip')
+            self.assertFalse(response.has_header('Content-Encoding'))
+
+
+# =============== Service Client Tests ===============
+@override_settings(PRODUCT_SERVICE_URL='http://products.local')
+class ServiceClientTest(TestCase):
+    """Test the pooled outbound HTTP client."""
+    
+    @patch('requests.Session.request')
+    def test_requests_share_session_and_record_metrics(self, mock_request):
+        """Test that calls reuse one session, use endpoint timeouts and are measured."""
+        mock_request.return_value = MagicMock(status_code=200)
+        client = ServiceClient('product-service', 'PRODUCT_SERVICE_URL', timeouts={'health': 1})
+        
+        client.get('/health/', endpoint='health')
+        session = client.session
+        client.get('http://products.local/api/products/?offset=10', endpoint='catalog')
+        
+        self.assertIs(client.session, session)
+        first, second = mock_request.call_args_list
+        self.assertEqual(first.args, ('GET', 'http://products.local/health/'))
+        self.assertEqual(first.kwargs['timeout'], 1)
+        self.assertEqual(second.args[1], 'http://products.local/api/products/?offset=10')
+        self.assertEqual(client.metrics()['endpoints']['health']['calls'], 1)
+        self.assertEqual(client.metrics()['endpoints']['catalog']['errors'], 0)
+        self.assertEqual(client.session.get_adapter('http://products.local').max_retries.read, 0)
+
+class CircuitBreakerTest(TestCase):
+    """Test the cache-backed circuit breaker."""
+    
+    def setUp(self):
+        cache.clear()
+    
+    def test_state_is_shared_between_workers(self):
+        """Test that a circuit opened by one worker is open for every worker."""
+        worker1 = CircuitBreaker('shared', max_failures=2, reset_timeout=60)
+        worker2 = CircuitBreaker('shared', max_failures=2, reset_timeout=60)
+        
+        worker1.record_failure()
+        worker2.record_failure()
+        
+        self.assertEqual(worker1.state, CircuitBreaker.OPEN)
+        with self.assertRaises(CircuitOpenError):
+            worker2.before_call()
+        self.assertEqual(worker2.metrics()['transitions'], {'CLOSED->OPEN': 1})
+    
+    def test_half_open_allows_limited_trials(self):
+        """Test that a half-open circuit lets a single probe through and closes on success."""
+        breaker = CircuitBreaker('probe', max_failures=1, reset_timeout=60, half_open_trials=1)
+        breaker.record_failure()
+        
+        with patch('orders.clients.time.time', return_value=time.time() + 61):
+            self.assertEqual(breaker.state, CircuitBreaker.HALF_OPEN)
+            breaker.before_call()
+            with self.assertRaises(CircuitOpenError):
+                breaker.before_call()
+            breaker.record_success()
+        
+        self.assertEqual(breaker.state, CircuitBreaker.CLOSED)
+    
+    @patch('requests.Session.request')
+    def test_open_circuit_skips_the_call(self, mock_request):
+        """Test that the client fails fast while the circuit is open."""
+        from requests.exceptions import ConnectionError
+        mock_request.side_effect = ConnectionError("down")
+        client = ServiceClient('flaky-service', 'PRODUCT_SERVICE_URL')
+        client.breaker.max_failures = 2
+        
+        for _ in range(2):
+            with self.assertRaises(ConnectionError):
+                client.get('/health/')
+        with self.assertRaises(CircuitOpenError):
+            client.get('/health/')
+        
+        self.assertEqual(mock_request.call_count, 2)
 
 # =============== Health Check Test ===============
 class HealthCheckTest(TestCase):
-    """Test the health check endpoint."""
+    """Test the health check endpoints."""
+    
+    def setUp(self):
+        cache.clear()
+        dependency_prober.invalidate()
+    
+    def tearDown(self):
+        dependency_prober.invalidate()
     
-    @patch('requests.get')
+    @patch('requests.Session.request')
     def test_health_check(self, mock_get):
         """Test health check endpoint."""
         # Mock the product service health check
@@ -302,5 +1415,57 @@ class HealthCheckTest(TestCase):
         response = self.client.get(url)
         self.assertEqual(response.status_code, 200)
         self.assertEqual(response.json()['status'], 'healthy')
+        
+        # The service health report includes the downstream client metrics
+        clients = self.client.get('/api/health/').json()['clients']
+        self.assertEqual(clients['product-service']['circuit']['state'], 'CLOSED')
+    
+    @patch('requests.Session.request')
+    def test_liveness_touches_no_dependency(self, mock_request):
+        """Liveness answers without calling the product service."""
+        response = self.client.get('/health/live')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['status'], 'alive')
+        mock_request.assert_not_called()
+    
+    @patch('requests.Session.request')
+    def test_readiness_reads_cached_results(self, mock_request):
+        """Readiness serves the last probe's results until they are an interval old."""
+        mock_request.return_value = MagicMock(status_code=200)
+        
+        response = self.client.get('/health/ready')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['status'], 'healthy')
+        self.assertEqual(response.json()['dependencies'], {'database': 'up', 'product_service': 'up'})
+        
+        response = self.client.get('/health/ready/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(mock_request.call_count, 1)
+    
+    @patch('requests.Session.request')
+    def test_readiness_degraded_and_unavailable(self, mock_request):
+        """A product service outage degrades readiness; a database outage fails it."""
+        from requests.exceptions import ConnectionError
+        mock_request.side_effect = ConnectionError("down")
+        
+        response = self.client.get('/health/ready')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['status'], 'degraded')
+        
+        with patch.object(dependency_prober, 'check_database', side_effect=Exception("down")):
+            dependency_prober.probe()
+        response = self.client.get('/health/ready')
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(response.json()['status'], 'unavailable')
+    
+    def test_readiness_stale_results(self):
+        """Results older than HEALTH_PROBE_MAX_AGE mean the prober has stalled."""
+        prober = DependencyProber(interval=10)
+        prober._results = {'database': {'status': 'up'}, 'product_service': {'status': 'up'}}
+        prober._checked_at = time.monotonic() - 60
+        
+        with override_settings(HEALTH_PROBE_MAX_AGE=30):
+            self.assertEqual(prober.report()['status'], 'stale')
+        self.assertEqual(DependencyProber().report()['status'], 'starting')
 
 
@@ -5,10 +5,12 @@ from . import views
 router = DefaultRouter()
 router.register(r'products', views.ProductViewSet, basename='product')
 router.register(r'orders', views.OrderViewSet, basename='order')
+router.register(r'reports', views.ReportViewSet, basename='report')
 
 urlpatterns = [
     path('', include(router.urls)),
     path('categories/', views.CategoryList.as_view(), name='category-list'),
     path('order-items/<int:pk>/', views.OrderItemUpdate.as_view(), name='orderitem-update'),
+    path('kitchen/stream/', views.kitchen_stream, name='kitchen-stream'),
     path('health/', views.health_check, name='health-check'),
 ]
\ No newline at end of file
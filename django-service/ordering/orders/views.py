@@ -4,21 +4,40 @@ from django.shortcuts import render
 # Create your views here.
 from rest_framework import generics, status, filters, viewsets
 from rest_framework.response import Response
+from rest_framework.request import Request
+from rest_framework.exceptions import APIException
+from rest_framework.fields import DateTimeField
+from rest_framework.settings import api_settings
 from rest_framework.decorators import action, api_view, permission_classes
 from rest_framework.permissions import IsAuthenticated, IsAdminUser, AllowAny
-from django.db.models import Prefetch, Count, Sum, Q
+from django.db import IntegrityError
+from django.db.models import Prefetch, Count, Sum, Avg, Q, F, ExpressionWrapper, DurationField
 from django.utils import timezone
 from django.core.cache import cache
-from .models import Product, Order, OrderItem, Category
+from .models import Product, Order, OrderItem, OrderTombstone, Category, StatusConflict
 from .serializers import (
     ProductSerializer, OrderSerializer, OrderStatusSerializer,
-    CategorySerializer, OrderItemSerializer, KitchenOrderSerializer
+    CategorySerializer, OrderItemSerializer
 )
-import requests
+from .availability import availability_index
+from .clients import event_service, product_service
+from .health import dependency_prober
+from .pagination import OrderCursorPagination
+from .projections import OrderProjection, order_rows
+from .routing import replica_reads
+from .kitchen import BOARD_STATUSES, kitchen_feed, kitchen_orders, sse_message
+from .rollups import GRAINS, day_start, product_totals, sales_series
+from .cache import catalog_cache_key, etag_matches, get_catalog_snapshot, get_or_set_response_data
+from .sync import CatalogSyncEngine, ProductServiceError, sync_lock
 from django.conf import settings
 from requests.exceptions import RequestException
-from django.http import JsonResponse
-from django.db import connection
+from django.core.handlers.asgi import ASGIRequest
+from django.http import JsonResponse, StreamingHttpResponse
+from django.views.decorators.http import require_GET
+from asgiref.sync import sync_to_async
+from django.utils.dateparse import parse_date, parse_datetime
+from datetime import timedelta
+import asyncio
 import logging
 
 # Set up logging
@@ -48,139 +67,92 @@ def api_root(request):
 @permission_classes([AllowAny])
 def health_check(request):
     """Health check endpoint for orchestration systems."""
-    # Check database connection
-    try:
-        with connection.cursor() as cursor:
-            cursor.execute("SELECT 1")
-            db_status = "up"
-    except Exception:
-        db_status = "down"
-    
-    # Check dependent services if needed
-    dependencies = {
-        "database": db_status,
-    }
-    
-    # Check product service
-    try:
-        response = requests.get(
-            f"{settings.PRODUCT_SERVICE_URL}/health/",
-            timeout=1
-        )
-        product_service_status = "up" if response.status_code == 200 else "down"
-    except Exception:
-        product_service_status = "down"
+    # Dependencies are checked by the background prober; this only reads its results
+    report = dependency_prober.current()
     
-    dependencies["product_service"] = product_service_status
-    
-    status = "healthy" if all(v == "up" for v in dependencies.values()) else "degraded"
+    status = "healthy" if report['status'] == 'healthy' else "degraded"
     
     return JsonResponse({
         "status": status,
         "service": settings.SERVICE_NAME,
         "version": settings.SERVICE_VERSION,
-        "dependencies": dependencies,
+        "dependencies": report['dependencies'],
+        "age": report['age'],
+        # Call counts, latency and circuit state of this process's downstream clients
+        "clients": {client.name: client.metrics() for client in (product_service, event_service)},
         "timestamp": timezone.now().isoformat()
     })
 
-# Add to the top of your file
-class CircuitBreaker:
-    """Simple circuit breaker implementation."""
-    def __init__(self, name, max_failures=3, reset_timeout=60):
-        self.name = name
-        self.max_failures = max_failures
-        self.reset_timeout = reset_timeout
-        self.failures = 0
-        self.state = "CLOSED"  # CLOSED, OPEN, HALF-OPEN
-        self.last_failure_time = None
+def liveness(request):
+    """Liveness probe: the process is up and serving requests. Touches no dependency."""
+    return JsonResponse({"status": "alive", "service": settings.SERVICE_NAME})
+
+def readiness(request):
+    """
+    Readiness probe built from the prober's cached results.
+    Not ready (503) until the first probe has run, when the results are stale
+    or when the database is down; a product service outage only degrades it.
+    """
+    report = dependency_prober.current()
+    ready = report['status'] in ('healthy', 'degraded')
     
-    def execute(self, func, *args, **kwargs):
-        """Execute function with circuit breaker pattern."""
-        import time
-        
-        if self.state == "OPEN":
-            # Check if timeout has elapsed
-            if self.last_failure_time and (time.time() - self.last_failure_time) > self.reset_timeout:
-                self.state = "HALF-OPEN"
-                logger.info(f"Circuit {self.name} changed from OPEN to HALF-OPEN")
-            else:
-                raise Exception(f"Circuit {self.name} is OPEN")
-        
-        try:
-            result = func(*args, **kwargs)
-            
-            # If successful and in HALF-OPEN, reset circuit
-            if self.state == "HALF-OPEN":
-                self.reset()
-                
-            return result
-            
-        except Exception as e:
-            self.record_failure()
-            raise e
+    return JsonResponse(
+        {"service": settings.SERVICE_NAME, **report},
+        status=200 if ready else 503
+    )
+
+def _authenticate(request):
+    """Run the DRF authentication classes for a plain (non-DRF) view."""
+    drf_request = Request(request, authenticators=[auth() for auth in api_settings.DEFAULT_AUTHENTICATION_CLASSES])
+    try:
+        return drf_request.user
+    except APIException:
+        return None
+
+@require_GET
+async def kitchen_stream(request):
+    """
+    Kitchen board as Server-Sent Events; serve it through ordering.asgi.
+    Sends the board as a 'snapshot' event, then 'upsert'/'remove' events per
+    changed order. Every connected screen shares the process's kitchen feed.
+    """
+    # Under WSGI the endless stream would be buffered whole, pinning a worker forever
+    if not isinstance(request, ASGIRequest):
+        return JsonResponse(
+            {"detail": "The kitchen stream needs an ASGI server, e.g. uvicorn ordering.asgi:application."},
+            status=501
+        )
     
-    def record_failure(self):
-        """Record a failure and potentially open the circuit."""
-        import time
-        
-        self.failures += 1
-        self.last_failure_time = time.time()
-        
-        if self.failures >= self.max_failures:
-            self.state = "OPEN"
-            logger.warning(f"Circuit {self.name} changed to OPEN after {self.failures} failures")
+    user = await sync_to_async(_authenticate)(request)
+    if user is None or not user.is_authenticated:
+        return JsonResponse({"detail": "Authentication credentials were not provided."}, status=401)
+    if not user.is_staff:
+        return JsonResponse({"detail": "Not authorized"}, status=403)
     
-    def reset(self):
-        """Reset the circuit breaker to closed state."""
-        self.failures = 0
-        self.state = "CLOSED"
-        self.last_failure_time = None
-        logger.info(f"Circuit {self.name} reset to CLOSED")
-
-# Create circuit breaker instance
-product_service_cb = CircuitBreaker("product-service")
-
-# Then in your create method:
-def create(self, request, *args, **kwargs):
-    """Create order with product validation from catalog service."""
-    # Validate products exist in catalog service
-    try:
-        product_ids = [item['product'] for item in request.data.get('items', [])]
-        
-        # Define function to call product service
-        def call_product_service():
-            response = requests.get(
-                f"{settings.PRODUCT_SERVICE_URL}/api/products/validate/",
-                params={'ids': ','.join(map(str, product_ids))},
-                timeout=3
-            )
-            if response.status_code != 200:
-                raise RequestException(f"Product service returned {response.status_code}")
-            return response
-        
-        # Use circuit breaker
+    async def events():
+        queue = kitchen_feed.subscribe()
+        keepalive = getattr(settings, 'KITCHEN_STREAM_KEEPALIVE', 15)
         try:
-            response = product_service_cb.execute(call_product_service)
-            
-            valid_products = response.json()
-            
-            # Check if all products are available
-            for product_id in product_ids:
-                if str(product_id) not in valid_products or not valid_products[str(product_id)]['available']:
-                    return Response(
-                        {"detail": f"Product {product_id} is unavailable"}, 
-                        status=status.HTTP_400_BAD_REQUEST
-                    )
-        except Exception as e:
-            logger.warning(f"Product validation failed: {str(e)}")
-            # Continue with degraded functionality
-            
-    except Exception as e:
-        logger.error(f"Error during product validation: {str(e)}")
-        # Continue with order creation
-        
-    return super().create(request, *args, **kwargs)
-
+            yield "retry: 3000\n\n"
+            yield sse_message('snapshot', await kitchen_feed.snapshot())
+            while True:
+                try:
+                    event, data = await asyncio.wait_for(queue.get(), keepalive)
+                except asyncio.TimeoutError:
+                    # Comment line keeps proxies from closing an idle stream
+                    yield ": keep-alive\n\n"
+                    continue
+                if event == 'snapshot':
+                    data = await kitchen_feed.snapshot()
+                yield sse_message(event, data)
+        finally:
+            kitchen_feed.unsubscribe(queue)
+    
+    return StreamingHttpResponse(
+        events(),
+        content_type='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
 
 # Product Views
 class ProductViewSet(viewsets.ReadOnlyModelViewSet):
@@ -194,92 +166,104 @@ class ProductViewSet(viewsets.ReadOnlyModelViewSet):
     ordering_fields = ['name', 'price', 'category']
     permission_classes = [AllowAny]
     
+    # Query parameters that change the listing; anything else is ignored by the cache key
+    list_cache_params = ['category', 'available', 'min_price', 'max_price', 'search', 'ordering', 'page']
+    
     def get_queryset(self):
-        """Optimize queries and implement caching."""
-        # Cache key based on query parameters
-        cache_key = f"products:{self.request.query_params}"
-        queryset = cache.get(cache_key)
+        """Optimize queries and apply the query parameter filters."""
+        queryset = Product.objects.select_related('category').all()
         
-        if not queryset:
-            queryset = Product.objects.select_related('category').all()
-            
-            # Filter by category if provided
-            category = self.request.query_params.get('category')
-            if category:
-                queryset = queryset.filter(category__name__iexact=category)
-            
-            # Filter by availability
-            available = self.request.query_params.get('available')
-            if available and available.lower() == 'true':
-                queryset = queryset.filter(is_available=True)
-            
-            # Filter by price range
-            min_price = self.request.query_params.get('min_price')
-            max_price = self.request.query_params.get('max_price')
-            if min_price:
-                queryset = queryset.filter(price__gte=float(min_price))
-            if max_price:
-                queryset = queryset.filter(price__lte=float(max_price))
-                
-            # Cache for 10 minutes
-            cache.set(cache_key, queryset, 60 * 10)
+        # Filter by category if provided
+        category = self.request.query_params.get('category')
+        if category:
+            queryset = queryset.filter(category__name__iexact=category)
+        
+        # Filter by availability
+        available = self.request.query_params.get('available')
+        if available and available.lower() == 'true':
+            queryset = queryset.filter(is_available=True)
+        
+        # Filter by price range
+        min_price = self.request.query_params.get('min_price')
+        max_price = self.request.query_params.get('max_price')
+        if min_price:
+            queryset = queryset.filter(price__gte=float(min_price))
+        if max_price:
+            queryset = queryset.filter(price__lte=float(max_price))
         
         return queryset
     
+    def list(self, request, *args, **kwargs):
+        """
+        List products, serving serialized pages from the response cache.
+        Keys include the catalog version, so any product change invalidates them.
+        """
+        build_page = super().list
+        key = catalog_cache_key('products', request, self.list_cache_params)
+        data = get_or_set_response_data(key, lambda: build_page(request, *args, **kwargs).data)
+        return Response(data)
+    
     @action(detail=False, methods=['get'])
     def featured(self, request):
         """Return featured products."""
-        featured = self.get_queryset().filter(is_featured=True)[:8]
-        serializer = self.get_serializer(featured, many=True)
-        return Response(serializer.data)
+        def build():
+            featured = self.get_queryset().filter(is_featured=True)[:8]
+            return self.get_serializer(featured, many=True).data
+        
+        key = catalog_cache_key('featured', request, self.list_cache_params)
+        return Response(get_or_set_response_data(key, build))
     
     @action(detail=False, methods=['get'])
     def by_category(self, request):
-        """Group products by category for menu display."""
-        categories = Category.objects.prefetch_related(
-            Prefetch('products', queryset=Product.objects.filter(is_available=True))
-        )
+        """
+        Group products by category for menu display.
+        Served from a snapshot rebuilt once per catalog version, with a strong
+        ETag so polling clients get a 304 while the menu is unchanged.
+        """
+        etag, menu = get_catalog_snapshot('menu', self._build_menu)
+        headers = {'ETag': etag}
         
-        result = {}
-        for category in categories:
-            serializer = ProductSerializer(category.products.all(), many=True)
-            result[category.name] = serializer.data
-            
-        return Response(result)
+        if etag_matches(etag, request.headers.get('If-None-Match', '')):
+            return Response(status=status.HTTP_304_NOT_MODIFIED, headers=headers)
+        
+        return Response(menu, headers=headers)
+    
+    def _build_menu(self):
+        """Build the grouped menu document in two queries."""
+        result = {name: [] for name in Category.objects.order_by('id').values_list('name', flat=True)}
+        
+        products = Product.objects.filter(is_available=True).select_related('category').order_by('id')
+        for product in ProductSerializer(products, many=True).data:
+            if product['category_name'] is not None:
+                result[product['category_name']].append(product)
+        
+        return result
     
     @action(detail=False, methods=['post'], permission_classes=[IsAdminUser])
     def sync_products(self, request):
         """
         Sync products from the product service.
-        Admin-only endpoint.
+        Admin-only endpoint. Pages through the catalog and writes only changed rows.
+        Pass {"mode": "delta"} to fetch only what changed since the last sync.
         """
+        engine = CatalogSyncEngine()
         try:
-            # Call product service to get all products
-            response = requests.get(
-                f"{settings.PRODUCT_SERVICE_URL}/api/products/",
-                params={'limit': 1000},  # Adjust based on your needs
-                timeout=10  # Longer timeout for bulk operation
+            with sync_lock() as acquired:
+                if not acquired:
+                    return Response(
+                        {"detail": "A catalog sync is already running"},
+                        status=status.HTTP_409_CONFLICT
+                    )
+                if request.data.get('mode') == 'delta':
+                    report = engine.run_delta()
+                else:
+                    report = engine.run()
+        except ProductServiceError as e:
+            logger.error(f"Product sync failed: {str(e)}")
+            return Response(
+                {"detail": "Unable to fetch products from product service"}, 
+                status=status.HTTP_503_SERVICE_UNAVAILABLE
             )
-            
-            if response.status_code != 200:
-                return Response(
-                    {"detail": "Unable to fetch products from product service"}, 
-                    status=status.HTTP_503_SERVICE_UNAVAILABLE
-                )
-                
-            products_data = response.json()
-            
-            # Process each product
-            synced_count = 0
-            for product_data in products_data.get('results', []):
-                Product.sync_from_product_service(product_data)
-                synced_count += 1
-                
-            return Response({
-                "detail": f"Successfully synced {synced_count} products",
-                "count": synced_count
-            })
-            
         except RequestException as e:
             logger.error(f"Product service unavailable during sync: {str(e)}")
             return Response(
@@ -287,6 +271,17 @@ class ProductViewSet(viewsets.ReadOnlyModelViewSet):
                 status=status.HTTP_503_SERVICE_UNAVAILABLE
             )
 
+        return Response({
+            "detail": f"Successfully synced {report['total']} products",
+            "count": report['total'],
+            "created": report['created'],
+            "updated": report['updated'],
+            "unchanged": report['unchanged'],
+            "removed": report['removed'],
+            "skipped": report['skipped'],
+            "mode": report['mode'],
+        })
+
 # Category Views
 class CategoryList(generics.ListAPIView):
     """List all product categories."""
@@ -302,6 +297,12 @@ class CategoryList(generics.ListAPIView):
         )
 
 # Order Views
+class OrderConflict(APIException):
+    """The order was changed by someone else in the meantime."""
+    status_code = status.HTTP_409_CONFLICT
+    default_detail = "The order was changed by someone else."
+    default_code = 'conflict'
+
 
 class OrderViewSet(viewsets.ModelViewSet):
     """
@@ -309,6 +310,8 @@ class OrderViewSet(viewsets.ModelViewSet):
     """
     serializer_class = OrderSerializer
     permission_classes = [IsAuthenticated]
+    # Keyset pages on (created_at, id) for list and history
+    pagination_class = OrderCursorPagination
     
     def get_queryset(self):
         """Optimize order queries with prefetch_related."""
@@ -320,11 +323,28 @@ class OrderViewSet(viewsets.ModelViewSet):
         else:
             queryset = Order.objects.filter(user=user)
             
+        # Status changes only touch the order row
+        if self.action == 'update_status':
+            return queryset
+            
         # Always prefetch related items and products for performance
         return queryset.prefetch_related(
             Prefetch('items', queryset=OrderItem.objects.select_related('product'))
         ).order_by('-created_at')
     
+    def list(self, request, *args, **kwargs):
+        """List orders through the values() projection (same JSON as OrderSerializer)."""
+        return self._projected_response(self.filter_queryset(self.get_queryset()))
+    
+    def _projected_response(self, queryset, paginate=True):
+        """Page and represent orders with OrderProjection instead of OrderSerializer."""
+        rows = order_rows(queryset)
+        page = self.paginate_queryset(rows) if paginate else None
+        data = OrderProjection().represent(rows if page is None else page)
+        if page is not None:
+            return self.get_paginated_response(data)
+        return Response(data)
+    
     def perform_create(self, serializer):
         """Set user automatically on create."""
         serializer.save(user=self.request.user)
@@ -350,71 +370,214 @@ class OrderViewSet(viewsets.ModelViewSet):
                 return Response({"detail": f"Invalid quantity for product {item.get('product')}"}, status=status.HTTP_400_BAD_REQUEST)
             product_ids.append(item['product'])
 
-        # Remote catalog service validation
+        # Availability check against the local index, falling back to the catalog service
         try:
-            response = requests.get(
-                f"{settings.PRODUCT_SERVICE_URL}/api/products/validate/",
-                params={'ids': ','.join(map(str, product_ids))},
-                timeout=3
-            )
+            unavailable = self.find_unavailable_products(product_ids)
+        except RequestException:
+            return Response({"detail": "Unable to validate products"}, status=status.HTTP_503_SERVICE_UNAVAILABLE)
 
-            if response.status_code != 200:
-                return Response({"detail": "Unable to validate products"}, status=status.HTTP_503_SERVICE_UNAVAILABLE)
+        for product_id in product_ids:
+            if str(product_id) in unavailable:
+                return Response({"detail": f"Product {product_id} is unavailable"}, status=status.HTTP_400_BAD_REQUEST)
 
-            valid_products = response.json()
+        # Proceed with order creation
+        return super().create(request, *args, **kwargs)
 
-            for product_id in product_ids:
-                if str(product_id) not in valid_products or not valid_products[str(product_id)]['available']:
-                    return Response({"detail": f"Product {product_id} is unavailable"}, status=status.HTTP_400_BAD_REQUEST)
+    def find_unavailable_products(self, product_ids):
+        """
+        Return the ids (as strings) of the given products that can't be ordered.
 
+        Availability comes from the local index of synced products; the catalog
+        service is only asked about ids the index doesn't know. If the service
+        can't be reached, unknown products are handled by
+        PRODUCT_AVAILABILITY_DEGRADED_POLICY ('allow' or 'reject'). Raises
+        RequestException when the service answers with an error status.
+        """
+        known, missing = availability_index.lookup(product_ids)
+        unavailable = {product_id for product_id, available in known.items() if not available}
+        if not missing:
+            return unavailable
+
+        try:
+            response = product_service.get(
+                "/api/products/validate/",
+                endpoint="validate",
+                params={'ids': ','.join(sorted(missing))},
+            )
         except RequestException as e:
             logger.error(f"Product service unavailable: {str(e)}")
+            if settings.PRODUCT_AVAILABILITY_DEGRADED_POLICY == 'reject':
+                return unavailable | missing
             logger.warning("Proceeding without remote product validation")
+            return unavailable
 
-        # Proceed with order creation
-        return super().create(request, *args, **kwargs)
+        if response.status_code != 200:
+            raise RequestException(f"Product service returned {response.status_code}", response=response)
+
+        valid_products = response.json()
+        return unavailable | {
+            product_id for product_id in missing
+            if product_id not in valid_products or not valid_products[product_id]['available']
+        }
+
+    @action(detail=False, methods=['post'])
+    def batch(self, request):
+        """
+        Submit many orders in one request (POS terminals replaying an offline queue).
+        Every referenced product is validated in one pass and all accepted orders
+        are inserted in bulk. Orders whose client_ref this user already submitted
+        are reported as duplicates with the existing order's id, so replaying a
+        queue after a lost response creates nothing twice. Returns a result per
+        order, in request order.
+        """
+        orders_data = request.data.get('orders') if isinstance(request.data, dict) else request.data
+        if not isinstance(orders_data, list) or not orders_data:
+            return Response({"detail": "Provide a non-empty list of orders."}, status=status.HTTP_400_BAD_REQUEST)
+
+        max_size = settings.ORDER_BATCH_MAX_SIZE
+        if len(orders_data) > max_size:
+            return Response(
+                {"detail": f"A batch can contain at most {max_size} orders."},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        # One remote validation and one local lookup for every product in the batch
+        product_ids = {
+            str(item.get('product')) for order_data in orders_data if isinstance(order_data, dict)
+            for item in order_data.get('items') or [] if isinstance(item, dict) and item.get('product') is not None
+        }
+        try:
+            unavailable = self.find_unavailable_products(product_ids)
+        except RequestException:
+            return Response({"detail": "Unable to validate products"}, status=status.HTTP_503_SERVICE_UNAVAILABLE)
+
+        context = self.get_serializer_context()
+        context['preloaded_products'] = {
+            str(pk): product for pk, product in
+            Product.objects.select_related('category').in_bulk(
+                [pk for pk in product_ids if pk.isdigit()]
+            ).items()
+        }
+
+        # Orders this user already submitted under the same client_ref
+        refs = {
+            str(order_data['client_ref']) for order_data in orders_data
+            if isinstance(order_data, dict) and order_data.get('client_ref') not in (None, '')
+        }
+        submitted = {
+            ref: str(order_id) for ref, order_id in
+            Order.objects.filter(user=request.user, client_ref__in=refs).values_list('client_ref', 'id')
+        }
+
+        results = []
+        accepted = []
+        first_with_ref = {}
+        for index, order_data in enumerate(orders_data):
+            result = {'index': index}
+            client_ref = None
+            if isinstance(order_data, dict) and 'client_ref' in order_data:
+                result['client_ref'] = order_data['client_ref']
+                if order_data['client_ref'] not in (None, ''):
+                    client_ref = str(order_data['client_ref'])
+            results.append(result)
+
+            if not isinstance(order_data, dict):
+                result.update(status='rejected', errors={"detail": "Each order must be an object."})
+                continue
+            if client_ref is not None and len(client_ref) > 100:
+                result.update(status='rejected', errors={"client_ref": "At most 100 characters."})
+                continue
+            if client_ref in submitted:
+                result.update(status='duplicate', id=submitted[client_ref])
+                continue
+            if client_ref in first_with_ref:
+                # Repeated within this batch; gets the first one's id once it is created
+                result.update(status='duplicate', duplicate_of=first_with_ref[client_ref])
+                continue
+
+            blocked = [item.get('product') for item in order_data.get('items') or []
+                       if isinstance(item, dict) and str(item.get('product')) in unavailable]
+            if blocked:
+                result.update(status='rejected', errors={"items": [f"Product {pk} is unavailable" for pk in blocked]})
+                continue
+
+            order_data = {key: value for key, value in order_data.items() if key not in ('user', 'client_ref')}
+            serializer = OrderSerializer(data=order_data, context=context)
+            if not serializer.is_valid():
+                result.update(status='rejected', errors=serializer.errors)
+                continue
+
+            if client_ref is not None:
+                first_with_ref[client_ref] = result
+            accepted.append((result, {**serializer.validated_data, 'user': request.user, 'client_ref': client_ref}))
+
+        if accepted:
+            try:
+                orders = OrderSerializer(many=True, context=context).create(
+                    [validated_data for _, validated_data in accepted]
+                )
+            except IntegrityError:
+                # Another request inserted one of these client_refs since the lookup
+                return Response(
+                    {"detail": "Some of these orders are being submitted concurrently; retry the batch."},
+                    status=status.HTTP_409_CONFLICT
+                )
+            for (result, _), order in zip(accepted, orders):
+                result.update(status='created', id=str(order.id), total_price=str(order.total_price))
+
+        for result in results:
+            first = result.pop('duplicate_of', None)
+            if first is not None:
+                result['id'] = first.get('id')
+
+        created = len(accepted)
+        duplicates = sum(result['status'] == 'duplicate' for result in results)
+        return Response({
+            "created": created,
+            "duplicates": duplicates,
+            "rejected": len(results) - created - duplicates,
+            "results": results,
+        })
 
     @action(detail=True, methods=['patch'])
     def update_status(self, request, pk=None):
         """
         Update order status only - optimized for kitchen/staff use.
-        Uses the simplified OrderStatusSerializer.
+        Uses the simplified OrderStatusSerializer; the change is one
+        conditional UPDATE, and losing a race to another writer is a 409.
         """
         order = self.get_object()
         serializer = OrderStatusSerializer(order, data=request.data, partial=True)
         
         if serializer.is_valid():
-            # Track status change time
-            new_status = serializer.validated_data.get('status')
-            if new_status and new_status != order.status:
-                # Set timestamp based on status
-                if new_status == 'CONFIRMED':
-                    order.confirmed_at = timezone.now()
-                elif new_status == 'PREPARING':
-                    order.preparing_at = timezone.now()
-                elif new_status == 'READY':
-                    order.ready_at = timezone.now()
-                elif new_status == 'DELIVERED':
-                    order.delivered_at = timezone.now()
-            
-            serializer.save()
+            self.perform_update(serializer)
             return Response(serializer.data)
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
     
+    def perform_update(self, serializer):
+        """Report a status change lost to another writer as a 409."""
+        try:
+            serializer.save()
+        except StatusConflict as e:
+            raise OrderConflict({"detail": str(e), "status": e.current})
+    
     @action(detail=False, methods=['get'])
     def active(self, request):
         """Get all active orders (not delivered or cancelled)."""
         active_orders = self.get_queryset().exclude(
             status__in=['DELIVERED', 'CANCELLED']
         )
-        serializer = self.get_serializer(active_orders, many=True)
-        return Response(serializer.data)
+        return self._projected_response(active_orders, paginate=False)
     
     @action(detail=False, methods=['get'])
     def kitchen_view(self, request):
         """
         Specialized endpoint for kitchen display system.
-        Requires staff permissions.
+        Requires staff permissions. Returns the board with its cursor in the
+        X-Kitchen-Cursor header; pass it back as ?since= to get only the
+        orders changed since, plus the ids of orders that left the board or
+        were deleted. Deltas re-read KITCHEN_STREAM_OVERLAP seconds before the
+        cursor, so late commits aren't missed and clients should de-dupe by id.
         """
         if not request.user.is_staff:
             return Response(
@@ -422,16 +585,47 @@ class OrderViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_403_FORBIDDEN
             )
             
-        # Get orders that need preparation
-        preparing_orders = Order.objects.filter(
-            status__in=['CONFIRMED', 'PREPARING']
-        ).prefetch_related(
-            Prefetch('items', queryset=OrderItem.objects.select_related('product'))
-        ).order_by('created_at')
+        # With ?since=<cursor> only orders changed since then are returned
+        since = request.query_params.get('since')
+        cursor = DateTimeField().to_representation(timezone.now())
+        
+        if not since:
+            board = kitchen_orders(Order.objects.filter(status__in=BOARD_STATUSES))
+            response = Response(list(board.values()))
+            response['X-Kitchen-Cursor'] = cursor
+            return response
         
-        # Use the specialized KitchenOrderSerializer
-        serializer = KitchenOrderSerializer(preparing_orders, many=True)
-        return Response(serializer.data)
+        try:
+            since = parse_datetime(since)
+        except ValueError:
+            since = None
+        if since is None:
+            return Response(
+                {"detail": "since must be an ISO 8601 timestamp, e.g. the last cursor"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        if timezone.is_naive(since):
+            since = timezone.make_aware(since)
+        
+        retention = timedelta(seconds=getattr(settings, 'KITCHEN_TOMBSTONE_RETENTION', 86400))
+        if since < timezone.now() - retention:
+            return Response(
+                {"detail": "Cursor expired; reload the board without since."},
+                status=status.HTTP_410_GONE
+            )
+        
+        # Re-read recent changes so rows committed late with an older updated_at aren't missed
+        since -= timedelta(seconds=getattr(settings, 'KITCHEN_STREAM_OVERLAP', 5))
+        
+        # Pending orders have not reached the board yet; any other change is a delta
+        changed = kitchen_orders(Order.objects.filter(updated_at__gte=since).exclude(status='PENDING'))
+        deleted = OrderTombstone.objects.filter(deleted_at__gte=since).values_list('order_id', flat=True)
+        removed = [order['id'] for order in changed.values() if order['status'] not in BOARD_STATUSES]
+        return Response({
+            "orders": [order for order in changed.values() if order['status'] in BOARD_STATUSES],
+            "removed": removed + [str(order_id) for order_id in deleted if str(order_id) not in changed],
+            "cursor": cursor,
+        })
         
     @action(detail=False, methods=['get'])
     def stats(self, request):
@@ -444,42 +638,46 @@ class OrderViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_403_FORBIDDEN
             )
             
-        # Get today's date
-        today = timezone.now().date()
+        # Shared by every staff screen for a few seconds
+        today = timezone.localdate()
+        stats = cache.get_or_set(
+            f"orders:stats:{today.isoformat()}",
+            lambda: self._compute_stats(today),
+            getattr(settings, 'ORDER_STATS_CACHE_TIMEOUT', 5)
+        )
         
-        # Calculate statistics
-        stats = {
-            'today_orders': Order.objects.filter(created_at__date=today).count(),
-            'today_revenue': Order.objects.filter(
-                created_at__date=today, 
-                status='DELIVERED'
-            ).aggregate(total=Sum('total_price'))['total'] or 0,
-            'pending_orders': Order.objects.filter(status='PENDING').count(),
-            'preparing_orders': Order.objects.filter(status='PREPARING').count(),
-            'ready_orders': Order.objects.filter(status='READY').count(),
-            'avg_preparation_time': 0,  # Calculate from timestamps
-        }
+        return Response(stats)
+    
+    @replica_reads()
+    def _compute_stats(self, day):
+        """
+        Compute the dashboard statistics in a single conditional-aggregation query.
+        The day is matched as a created_at range so the index can be used, and
+        the average preparation time (minutes, for the day's orders) is
+        computed by the database.
+        """
+        today = Q(created_at__gte=day_start(day), created_at__lt=day_start(day + timedelta(days=1)))
+        prepared = Q(confirmed_at__isnull=False, ready_at__isnull=False)
+        prep_time = ExpressionWrapper(F('ready_at') - F('confirmed_at'), output_field=DurationField())
         
-        # Calculate average preparation time
-        completed_orders = Order.objects.filter(
-            confirmed_at__isnull=False,
-            ready_at__isnull=False
+        totals = Order.objects.filter(
+            today | Q(status__in=['PENDING', 'PREPARING', 'READY'])
+        ).aggregate(
+            today_orders=Count('id', filter=today),
+            today_revenue=Sum('total_price', filter=today & Q(status='DELIVERED')),
+            pending_orders=Count('id', filter=Q(status='PENDING')),
+            preparing_orders=Count('id', filter=Q(status='PREPARING')),
+            ready_orders=Count('id', filter=Q(status='READY')),
+            avg_preparation=Avg(prep_time, filter=today & prepared),
         )
         
-        if completed_orders.exists():
-            total_minutes = 0
-            count = 0
-            
-            for order in completed_orders:
-                prep_time = (order.ready_at - order.confirmed_at).total_seconds() // 60
-                total_minutes += prep_time
-                count += 1
-                
-            stats['avg_preparation_time'] = round(total_minutes / count, 1)
-        
-        return Response(stats)
+        avg_preparation = totals.pop('avg_preparation')
+        totals['today_revenue'] = totals['today_revenue'] or 0
+        totals['avg_preparation_time'] = round(avg_preparation.total_seconds() / 60, 1) if avg_preparation else 0
+        return totals
     
     @action(detail=False, methods=['get'])
+    @replica_reads()
     def history(self, request):
         """Get user's order history with pagination."""
         user = request.user
@@ -488,18 +686,10 @@ class OrderViewSet(viewsets.ModelViewSet):
         completed_orders = Order.objects.filter(
             user=user,
             status__in=['DELIVERED', 'CANCELLED']
-        ).prefetch_related(
-            Prefetch('items', queryset=OrderItem.objects.select_related('product'))
         ).order_by('-created_at')
         
-        # Apply pagination
-        page = self.paginate_queryset(completed_orders)
-        if page is not None:
-            serializer = self.get_serializer(page, many=True)
-            return self.get_paginated_response(serializer.data)
-        
-        serializer = self.get_serializer(completed_orders, many=True)
-        return Response(serializer.data)
+        # Paginated, items loaded in one query for the page
+        return self._projected_response(completed_orders)
 
 # Order Item Views (for individual item updates)
 class OrderItemUpdate(generics.UpdateAPIView):
@@ -518,4 +708,71 @@ class OrderItemUpdate(generics.UpdateAPIView):
         else:
             serializer.save()
             
-            
\ No newline at end of file
+            
+# Reporting Views (served from the sales rollups)
+class ReportViewSet(viewsets.ViewSet):
+    """
+    Sales reports read from the hourly/daily rollup tables, so their cost
+    depends on the number of buckets in the range, not the number of orders.
+    Dates are local calendar days; `start` and `end` are inclusive and default
+    to the last 7 days.
+    """
+    permission_classes = [IsAdminUser]
+    
+    def _date_range(self, request):
+        """Return (start, end) aware datetimes for the requested days, or None if invalid."""
+        today = timezone.localdate()
+        try:
+            start = parse_date(request.query_params.get('start', '')) or today - timedelta(days=6)
+            end = parse_date(request.query_params.get('end', '')) or today
+        except ValueError:
+            return None
+        if start > end:
+            return None
+        return day_start(start), day_start(end + timedelta(days=1))
+    
+    def _invalid_range(self):
+        return Response(
+            {"detail": "start and end must be dates (YYYY-MM-DD) with start <= end"},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    
+    @action(detail=False, methods=['get'])
+    @replica_reads()
+    def sales(self, request):
+        """Orders, revenue and mean confirm->ready time per hour or day."""
+        grain = request.query_params.get('grain', 'day')
+        if grain not in GRAINS:
+            return Response(
+                {"detail": f"grain must be one of: {', '.join(GRAINS)}"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        date_range = self._date_range(request)
+        if date_range is None:
+            return self._invalid_range()
+        
+        return Response({
+            "grain": grain,
+            "start": date_range[0].isoformat(),
+            "end": date_range[1].isoformat(),
+            "buckets": sales_series(grain, *date_range),
+        })
+    
+    @action(detail=False, methods=['get'])
+    @replica_reads()
+    def products(self, request):
+        """Items sold and revenue per product over the range."""
+        date_range = self._date_range(request)
+        if date_range is None:
+            return self._invalid_range()
+        return Response({"products": product_totals(*date_range)})
+    
+    @action(detail=False, methods=['get'])
+    @replica_reads()
+    def categories(self, request):
+        """Items sold and revenue per category over the range."""
+        date_range = self._date_range(request)
+        if date_range is None:
+            return self._invalid_range()
+        return Response({"categories": product_totals(*date_range, group_by='category')})